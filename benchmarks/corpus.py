@@ -0,0 +1,110 @@
+import os
+import json
+import random
+import subprocess
+from PIL import Image, ImageDraw
+
+
+# what the corpus is made of: each kind of file, how big it is and how many copies to make
+DEFAULT_SPEC = {
+    "seed": 0,
+    "gifs": [
+        {"width": 240, "height": 180, "frames": 12, "copies": 4},
+        {"width": 400, "height": 300, "frames": 30, "copies": 4},
+        {"width": 800, "height": 600, "frames": 60, "copies": 2},
+    ],
+    "videos": [
+        {"width": 640, "height": 360, "seconds": 2, "copies": 3},
+        {"width": 1280, "height": 720, "seconds": 4, "copies": 2},
+        {"width": 1920, "height": 1080, "seconds": 3, "copies": 1},
+    ],
+}
+
+
+def make_gif(filepath, width, height, frames, rng):
+    """ a looping GIF of a few shapes moving over a solid background (so there is a clear border color) """
+    background = tuple(rng.randrange(256) for _ in range(3))
+    shapes = [{
+        "color": tuple(rng.randrange(256) for _ in range(3)),
+        "size": rng.randrange(max(2, height // 8), max(3, height // 3)),
+        "x": rng.randrange(width),
+        "y": rng.randrange(height),
+        "dx": rng.uniform(-0.1, 0.1) * width,
+        "dy": rng.uniform(-0.1, 0.1) * height,
+    } for _ in range(rng.randrange(2, 6))]
+
+    images = []
+    for i in range(frames):
+        im = Image.new("RGB", (width, height), background)
+        draw = ImageDraw.Draw(im)
+        for shape in shapes:
+            x = (shape["x"] + shape["dx"] * i) % width
+            y = (shape["y"] + shape["dy"] * i) % height
+            draw.ellipse([x, y, x + shape["size"], y + shape["size"]], fill=shape["color"])
+        images.append(im)
+
+    images[0].save(filepath, save_all=True, append_images=images[1:], duration=40, loop=0)
+
+
+def make_video(filepath, width, height, seconds, rng):
+    """ an H.264 MP4 of one of ffmpeg's moving test patterns """
+    pattern = rng.choice(["testsrc2", "mandelbrot", "life"])
+    source = f"{pattern}=size={width}x{height}:rate=30"
+    if pattern == "life":
+        source = f"life=size={width}x{height}:rate=30:mold=10:ratio=0.1:death_color=#C83232:life_color=#00ff00"
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", source, "-t", str(seconds),
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast",
+        filepath
+    ], check=True)
+
+
+def generate_corpus(folder, spec=None):
+    """Generates the synthetic corpus, or reuses it if it was made from the same spec.
+
+    Everything is derived from the spec's seed, so the same spec always
+    produces the same files.
+
+    Args:
+        folder (str): Where to put the files.
+        spec (dict, optional): What to make. Defaults to `DEFAULT_SPEC`.
+
+    Returns:
+        list of dict: One entry per file with its "name" (also the shot title),
+            "filename" and "kind" ("gif" or "mp4").
+    """
+    spec = spec or DEFAULT_SPEC
+    spec_filepath = os.path.join(folder, "spec.json")
+    index_filepath = os.path.join(folder, "index.json")
+
+    # already made
+    if os.path.isfile(spec_filepath) and os.path.isfile(index_filepath):
+        with open(spec_filepath, encoding="utf-8") as f:
+            if json.load(f) == spec:
+                with open(index_filepath, encoding="utf-8") as f:
+                    return json.load(f)
+
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(spec["seed"])
+    files = []
+
+    for gif in spec["gifs"]:
+        for copy in range(gif["copies"]):
+            name = f"gif {gif['width']}x{gif['height']} {gif['frames']}f {copy}"
+            filename = f"gif-{gif['width']}x{gif['height']}-{gif['frames']}f-{copy}.gif"
+            make_gif(os.path.join(folder, filename), gif["width"], gif["height"], gif["frames"], rng)
+            files.append({"name": name, "filename": filename, "kind": "gif"})
+
+    for video in spec["videos"]:
+        for copy in range(video["copies"]):
+            name = f"video {video['width']}x{video['height']} {video['seconds']}s {copy}"
+            filename = f"video-{video['width']}x{video['height']}-{video['seconds']}s-{copy}.mp4"
+            make_video(os.path.join(folder, filename), video["width"], video["height"], video["seconds"], rng)
+            files.append({"name": name, "filename": filename, "kind": "mp4"})
+
+    with open(index_filepath, "w", encoding="utf-8") as f:
+        json.dump(files, f, indent=4)
+    with open(spec_filepath, "w", encoding="utf-8") as f:
+        json.dump(spec, f, indent=4)
+    return files
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+import contextlib
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from create_backgrounds import (
+    GIF_FFMPEG_ARGS, convert_video, download_source, find_media_files,
+    get_image_background_color, make_backgrounds, save_first_frame_of_gif
+)
+from utils.asset_manifest import AssetManifest
+from utils.ffmpeg_utils import configure_ffmpeg, threads_for
+from utils.likes_scraper import scrape_likes
+from utils.media_downloads import download_concurrently
+from utils.templates import load_template
+
+from benchmarks.corpus import DEFAULT_SPEC, generate_corpus
+from benchmarks.server import server_url, start_server
+
+
+REPO_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_FOLDER = os.path.join(REPO_FOLDER, "benchmarks")
+
+# the files make_background expects to find in the current folder
+WALLPAPER_FILES = [
+    "gif_template.html", "video_template.html", "project_template.json", "gif_main.js", "video_main.js"
+]
+
+USERNAME = "benchmark"
+
+
+class Stopwatch:
+    """ times each stage of one benchmark run """
+
+    def __init__(self, quiet=True):
+        self.stages = {}
+        self.quiet = quiet
+
+    @contextlib.contextmanager
+    def stage(self, name, items=None):
+        # printing from the code under test shouldn't be part of its time
+        output = open(os.devnull, "w") if self.quiet else sys.stdout
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(output):
+                yield
+        finally:
+            self.stages[name] = {"seconds": time.perf_counter() - start, "items": items}
+            if self.quiet:
+                output.close()
+
+
+def run_once(base_url, workers, jobs, quiet=True):
+    """Runs every stage once in a fresh working folder.
+
+    Returns:
+        dict: The seconds each stage took and how many items it handled.
+    """
+    stopwatch = Stopwatch(quiet=quiet)
+    workdir = tempfile.mkdtemp(prefix="dribbble-benchmark-")
+    previous_cwd = os.getcwd()
+    try:
+        for filename in WALLPAPER_FILES:
+            shutil.copy(os.path.join(REPO_FOLDER, filename), workdir)
+        os.chdir(workdir)
+        os.makedirs("downloads")
+        configure_ffmpeg(max_jobs=jobs, threads_per_job=threads_for(jobs))
+
+        with stopwatch.stage("scrape"):
+            sources = scrape_likes(USERNAME, base_url=base_url)
+        stopwatch.stages["scrape"]["items"] = len(sources)
+
+        manifest = AssetManifest(os.path.join("downloads", "manifest.jsonl"))
+        with stopwatch.stage("download", items=len(sources)):
+            download_concurrently(sources, partial(download_source, manifest=manifest), workers=workers)
+
+        media_files = find_media_files()
+        gifs = [f for f in media_files if f.endswith(".gif")]
+        videos = [f for f in media_files if not f.endswith(".gif")]
+
+        # convert to a separate folder so the full build below starts from the downloads
+        os.makedirs("converted")
+        with stopwatch.stage("convert", items=len(videos)):
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(lambda f: convert_video(
+                    f, os.path.join("converted", os.path.basename(f) + ".gif"), GIF_FFMPEG_ARGS
+                ), videos))
+
+        with stopwatch.stage("preview", items=len(gifs)):
+            for filepath in gifs:
+                save_first_frame_of_gif(filepath, os.path.join("converted", os.path.basename(filepath)))
+
+        with stopwatch.stage("color", items=len(gifs)):
+            for filepath in gifs:
+                get_image_background_color(filepath)
+
+        with stopwatch.stage("template", items=len(media_files)):
+            for filepath in media_files:
+                folder = os.path.dirname(filepath)
+                with open(os.path.join(folder, "index.html"), "w", encoding="utf-8") as f:
+                    f.write(load_template("gif_template.html", "html").render(
+                        FILENAME=os.path.basename(filepath), COLOR="#000000", TITLE=folder
+                    ))
+                with open(os.path.join(folder, "project.json"), "w", encoding="utf-8") as f:
+                    f.write(load_template("project_template.json", "json").render(
+                        DESCRIPTION=folder, COLOR="#000000", PREVIEW="preview.png", TITLE=folder
+                    ))
+
+        # everything together, the way create_backgrounds.py builds wallpapers
+        # (without the conversions cached by the convert stage)
+        shutil.rmtree("cache", ignore_errors=True)
+        with stopwatch.stage("make_backgrounds", items=len(media_files)):
+            make_backgrounds(jobs=jobs, dedupe=False)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return stopwatch.stages
+
+
+def summarize(runs):
+    """ the min, median and mean of each stage across runs """
+    summary = {}
+    for name in runs[0]:
+        seconds = [run[name]["seconds"] for run in runs]
+        summary[name] = {
+            "items": runs[0][name]["items"],
+            "min": min(seconds),
+            "median": statistics.median(seconds),
+            "mean": statistics.mean(seconds),
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_FOLDER,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_summary(summary, baseline=None):
+    print(f"{'stage':<18}  {'items':>5}  {'median (s)':>10}  {'min (s)':>8}" + ("  vs baseline" if baseline else ""))
+    for name, stage in summary.items():
+        line = f"{name:<18}  {stage['items'] or 0:>5}  {stage['median']:>10.3f}  {stage['min']:>8.3f}"
+        if baseline and name in baseline:
+            change = stage["median"] / max(baseline[name]["median"], 1e-9) - 1
+            line += f"  {change:+.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every stage on a synthetic corpus served from a local server.")
+    parser.add_argument("--repeat", type=int, default=3, help="number of times to run every stage")
+    parser.add_argument("--workers", type=int, default=8, help="number of files to download at the same time")
+    parser.add_argument("--jobs", type=int, default=1, help="number of conversions and wallpapers to build at the same time")
+    parser.add_argument("--corpus", default=os.path.join(BENCHMARKS_FOLDER, "corpus"), help="where to generate the corpus")
+    parser.add_argument("--output", default=None, help="where to save the results (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="an earlier results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the code being benchmarked")
+    args = parser.parse_args()
+
+    print("Generating corpus.")
+    shots = generate_corpus(args.corpus, DEFAULT_SPEC)
+
+    server = start_server(args.corpus, shots)
+    runs = []
+    try:
+        for i in range(args.repeat):
+            print(f"Run {i + 1}/{args.repeat}.")
+            runs.append(run_once(server_url(server), args.workers, args.jobs, quiet=not args.verbose))
+    finally:
+        server.shutdown()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"repeat": args.repeat, "workers": args.workers, "jobs": args.jobs},
+        "corpus": DEFAULT_SPEC,
+        "stages": summarize(runs),
+        "runs": runs,
+    }
+
+    output = args.output or os.path.join(
+        BENCHMARKS_FOLDER, "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+    print_summary(results["stages"], baseline)
+    print(f"Saved results to '{output}'.")
@@ -0,0 +1,91 @@
+import os
+import html
+import threading
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+SHOTS_PER_PAGE = 12
+
+
+def shot_html(shot, base_url):
+    """ one shot on a likes page, with the same markup the extractors read """
+    name = html.escape(shot["name"])
+    stem = html.escape(shot["filename"].rsplit(".", 1)[0])
+    if shot["kind"] == "mp4":
+        # videos have a PNG still and a teaser to download the video from
+        image = f"{base_url}/media/{stem}_still.png"
+        teaser = f' data-video-teaser-large="{base_url}/media/{stem}_large_preview.mp4"'
+    else:
+        # GIFs have a still that gets turned back into the GIF's URL
+        image = f"{base_url}/media/{stem}_still_1x.gif"
+        teaser = ""
+    return f"""
+        <li class="shot-thumbnail">
+            <div class="shot-thumbnail-base"{teaser}>
+                <img src="{image}">
+            </div>
+            <div class="shot-title">{name}</div>
+            <a rel="contact" href="/benchmark-author">
+                <span class="display-name">Benchmark Author</span>
+            </a>
+        </li>"""
+
+
+class LikesHandler(SimpleHTTPRequestHandler):
+    """ serves fake likes pages at /<user>/likes?page=N and the corpus files under /media/ """
+
+    def __init__(self, *args, shots=None, **kwargs):
+        self.shots = shots
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/likes"):
+            return self.send_likes_page(int(parse_qs(url.query).get("page", ["1"])[0]))
+
+        # /media/<stem>_large_preview.mp4 is the video itself
+        if url.path.startswith("/media/"):
+            self.path = url.path[len("/media"):].replace("_large_preview", "")
+        return super().do_GET()
+
+    def send_likes_page(self, page):
+        page_shots = self.shots[(page - 1) * SHOTS_PER_PAGE:page * SHOTS_PER_PAGE]
+        if page_shots:
+            base_url = f"http://{self.headers.get('Host')}"
+            body = "<ul>" + "".join(shot_html(shot, base_url) for shot in page_shots) + "</ul>"
+        else:
+            body = '<div class="null-message">No more likes.</div>'
+        body = f"<html><body>{body}</body></html>".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(corpus_folder, shots):
+    """Serves the corpus and its likes pages from a background thread.
+
+    Args:
+        corpus_folder (str): The folder made by `generate_corpus`.
+        shots (list of dict): The corpus index from `generate_corpus`.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Its URL is `server_url(server)`.
+            Call `server.shutdown()` when done.
+    """
+    handler = partial(LikesHandler, directory=os.path.abspath(corpus_folder), shots=shots)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
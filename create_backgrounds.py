@@ -1,148 +1,498 @@
+import argparse
 import cv2
 import os
-import time
 import re
 import subprocess
-import shutil
-import urllib.request
+import queue
+import threading
+import requests
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from pprint import pprint
 
 # pip install image
-from PIL import Image, ImageFilter
+from PIL import ImageFilter
 
+from utils.animated_image import ANIMATED_IMAGE_FORMATS, convert_animation, supports_animated_format
+from utils.asset_manifest import AssetManifest, hash_file
 from utils.base_webdriver import BaseWebDriver
+from utils.build_record import BuildRecord
+from utils.conversion_cache import ConversionCache
+from utils.dedup import DuplicateIndex, HashCache, dedupe_media_files, mark_duplicate
+from utils.ffmpeg_utils import configure_ffmpeg, probe_video_codec, run_ffmpeg, threads_for
+from utils.file_utils import link_or_copy
+from utils.gif_optimizer import optimize_gif
 from utils.json_utils import save_json_file, load_json_file
+from utils.likes_scraper import scrape_likes
+from utils.media_analysis import MediaAnalysis, as_analysis, dominant_border_color
+from utils.media_downloads import download_concurrently, download_file, fetch_validators
+from utils.profiling import enable_profiling, get_profiler, span, take_worker_spans
+from utils.templates import load_template
+
+# the kinds of downloaded files that can become wallpapers
+IMAGE_TYPES = ["gif"] + list(ANIMATED_IMAGE_FORMATS)
+VIDEO_TYPES = ["mp4", "webm"]
+MEDIA_TYPES = IMAGE_TYPES + VIDEO_TYPES
+
+# turns a video into a looping GIF with a palette made for it
+GIF_FFMPEG_ARGS = ["-vf", "fps=30,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse", "-loop", "0"]
+
+# how many times to replace the packaging processes after one dies before building in-process instead
+MAX_POOL_RESTARTS = 2
+
+
+def download_dribbble_likes(
+    username, password, output_folder=None, bwd=None,
+    workers=8, scraper="browser", on_downloaded=None, browser_address=None
+):
+    """ fetch all of your Dribbble likes and download them
+
+    @workers:           number of files to download at the same time
+    @scraper:           "browser" to log in and scrape with Selenium,
+                        "http" to fetch the public likes pages without a browser
+    @on_downloaded:     called with the filepath of each newly downloaded file
+    @browser_address:   attach the browser scraper to the running Chrome at this host:port"""
+    # save to the current folder by default
+    if output_folder is None:
+        output_folder = os.getcwd()
+
+    # get the info for all liked shots
+    if scraper == "browser":
+        with span("scrape_likes"):
+            sources = scrape_likes_with_browser(username, password, bwd=bwd, browser_address=browser_address)
+    elif scraper == "http":
+        print("Scraping info for all likes over HTTP.")
+        with span("scrape_likes"):
+            sources = scrape_likes(username)
+    else:
+        raise ValueError(f"Invalid scraper: {scraper}!")
+
+    print(f"Starting download of {len(sources)} liked files.")
 
-def download_dribbble_likes(username, password, output_folder=None, bwd=None):
-    """ log into Dribbble and fetch all of your likes using Selenium"""
+    # create downloads folder
+    if not os.path.exists("downloads"):
+        os.makedirs("downloads")
+
+    # only download one shot per folder name
+    unique_sources = {}
+    for source in sources:
+        cleaned_name = slugify(source["name"])
+        if cleaned_name is not None and cleaned_name not in unique_sources:
+            unique_sources[cleaned_name] = source
+    sources = list(unique_sources.values())
+
+    # remembers what we downloaded so later runs can revalidate cheaply
+    manifest = AssetManifest(os.path.join("downloads", "manifest.jsonl"))
+
+    # download all GIF and MP4 files, several at a time
+    download_concurrently(
+        sources,
+        partial(download_source, manifest=manifest, on_downloaded=on_downloaded),
+        workers=workers
+    )
+    manifest.compact()
+
+    print("Finished downloading.")
+
+
+def scrape_likes_with_browser(username, password, bwd=None, scroll_timeout=600, browser_address=None):
+    """ log into Dribbble and scrape the info for all of your likes using Selenium
+
+    @scroll_timeout:    give up loading more likes after this number of seconds
+    @browser_address:   attach to the running Chrome at this host:port instead of starting one"""
     # make a new webdriver by default
+    # (the extractor only reads attributes, so don't load any images, video or fonts)
     should_clean_webdriver = False
     if bwd is None:
-        bwd = BaseWebDriver()
+        bwd = BaseWebDriver(lean=True, debugger_address=browser_address)
         should_clean_webdriver = True
-    
-    # save to the current folder by default
-    if output_folder is None:
-        output_folder = os.getcwd()
 
-    # load the sign-in page
-    bwd.get("https://dribbble.com/session/new")
-    
-    # log in
-    print("Logging in.")
-    username_input = bwd.get_elem("""document.getElementById("login")""")
-    password_input = bwd.get_elem("""document.getElementById("password")""")
-    bwd.send_keys(username_input, username, speed=0.01)
-    bwd.send_keys(password_input, password, speed=0.01)
-    bwd.js("""document.querySelector("input[value='Sign In']").click()""")
+    # log in (or reuse the last session)
+    with span("login"):
+        log_in_to_dribbble(bwd, username, password)
 
     # load the likes page
     print("Loading the likes page.")
-    bwd.get(f"https://dribbble.com/{username}/likes")
-
-    # scroll to the bottom of the page
-    bottom_of_page = False
-    while not bottom_of_page:
-        print("Scrolling to bottom of page.")
-        bottom_of_page = bwd.js("""
-            const reachedBottomOfPage = document.getElementsByClassName("null-message")[0];
-            if (!reachedBottomOfPage) {
-                document.getElementsByClassName("form-btn load-more")[0].click()
-                window.scrollTo(0, document.body.scrollHeight)
-                return false;
-            } else {
-                return true;
-            }
-        """)
-        time.sleep(0.1)
+    with span("load_likes_page"):
+        bwd.get(f"https://dribbble.com/{username}/likes")
+
+    # load every page of likes in one round trip
+    # (the page clicks "load more" itself whenever the previous page has rendered)
+    print("Scrolling to bottom of page.")
+    with span("scroll_likes"):
+        result = bwd.js_async("""
+            const timeoutMs = arguments[0];
+            const done = arguments[arguments.length - 1];
+
+            let pagesLoaded = 1;
+            let lastCount = document.getElementsByClassName("shot-thumbnail").length;
+            let waiting = false;
+            let finished = false;
+
+            const finish = (reachedEnd) => {
+                if (finished) {
+                    return;
+                }
+                finished = true;
+                observer.disconnect();
+                clearInterval(nudge);
+                clearTimeout(deadline);
+                done({"pages": pagesLoaded, "reached_end": reachedEnd});
+            };
+
+            const loadNextPage = () => {
+                if (document.getElementsByClassName("null-message")[0]) {
+                    return finish(true);
+                }
+
+                // wait for the previous click to add shots before clicking again
+                const count = document.getElementsByClassName("shot-thumbnail").length;
+                if (count > lastCount) {
+                    lastCount = count;
+                    pagesLoaded++;
+                    waiting = false;
+                }
+                if (waiting) {
+                    return;
+                }
+
+                const loadMore = document.getElementsByClassName("form-btn load-more")[0];
+                if (loadMore) {
+                    loadMore.click();
+                    waiting = true;
+                }
+                window.scrollTo(0, document.body.scrollHeight);
+            };
+
+            const observer = new MutationObserver(loadNextPage);
+            observer.observe(document.body, {"childList": true, "subtree": true});
+
+            // click again if a request got lost and nothing changed for a while
+            const nudge = setInterval(() => { waiting = false; loadNextPage(); }, 3000);
+            const deadline = setTimeout(() => finish(false), timeoutMs);
+
+            loadNextPage();
+        """, scroll_timeout * 1000, timeout=scroll_timeout + 10)
+
+    print(f"Loaded {result['pages']} page(s) of likes.")
+    if not result["reached_end"]:
+        print(f"Gave up scrolling after {scroll_timeout} seconds, some likes may be missing.")
 
     # scrape all info and links
     print("Scraping info for all likes from page.")
-    sources = bwd.js("""
-        sources = []
-        Array.from(document.getElementsByClassName("shot-thumbnail")).forEach(e => {
-            const nameNode = e.getElementsByClassName("shot-title")[0];
-            const name = nameNode && nameNode.innerText;
-            const authorURLNode = e.querySelector("a[rel='contact']");
-            const authorURL = authorURLNode && authorURLNode.getAttribute("href");
-            const authorNode = e.getElementsByClassName("display-name")[0];
-            const author = authorNode && authorNode.innerText;
-
-            // is it a GIF or an MP4?
-            let mediaSource;
-            let imageSource = e.querySelector("img").getAttribute("src");
-            if (imageSource.includes(".png")) { // mp4
-                mediaSource = e.querySelector("[class*='shot-thumbnail-base']").getAttribute("data-video-teaser-large").replace("_large_preview", "");
-            } else { // gif
-                mediaSource = imageSource.replace(/(_still|_\\dx).*/, ".gif")
-            }
-
-            // add to sources
-            sources.push({
-                "src": mediaSource,
-                "name": name,
-                "author_url": "https://dribbble.com" + authorURL,
-                "author": author,
-            })
-        });
-        return sources;
-    """)
+    with span("extract_likes"):
+        sources = bwd.js("""
+            sources = []
+            Array.from(document.getElementsByClassName("shot-thumbnail")).forEach(e => {
+                const nameNode = e.getElementsByClassName("shot-title")[0];
+                const name = nameNode && nameNode.innerText;
+                const authorURLNode = e.querySelector("a[rel='contact']");
+                const authorURL = authorURLNode && authorURLNode.getAttribute("href");
+                const authorNode = e.getElementsByClassName("display-name")[0];
+                const author = authorNode && authorNode.innerText;
+
+                // is it a GIF or an MP4?
+                let mediaSource;
+                let imageSource = e.querySelector("img").getAttribute("src");
+                if (imageSource.includes(".png")) { // mp4
+                    mediaSource = e.querySelector("[class*='shot-thumbnail-base']").getAttribute("data-video-teaser-large").replace("_large_preview", "");
+                } else { // gif
+                    mediaSource = imageSource.replace(/(_still|_\\dx).*/, ".gif")
+                }
+
+                // add to sources
+                sources.push({
+                    "src": mediaSource,
+                    "name": name,
+                    "author_url": "https://dribbble.com" + authorURL,
+                    "author": author,
+                })
+            });
+            return sources;
+        """)
+
+    # show how long we spent waiting for the page
+    bwd.report_wait_latencies()
 
     # destroy webdriver if we created it just for this instance
     print("Closing webdriver.")
     if should_clean_webdriver:
         bwd.quit()
 
-    print(f"Starting download of {len(sources)} liked files.")
+    return sources
 
-    # create downloads folder
-    if not os.path.exists("downloads"):
-        os.makedirs("downloads")
 
-    # download all GIF and MP4 files
-    i = 0
-    for source in sources:
-        # increment
-        i += 1
+def log_in_to_dribbble(bwd, username, password, cookies_filepath=os.path.join("cache", "dribbble_cookies.json")):
+    """ log into Dribbble, reusing the cookies from the last login while they're still valid
 
-        # build output name
-        file_type = source["src"].split(".")[-1]
-        cleaned_name = slugify(source['name'])
+    the session is checked by loading the sign-in page, which Dribbble redirects away from
+    when you're already signed in (this also works with a logged-in `user_profile_dir`)
 
-        # 
-        if cleaned_name is None:
-            continue
+    @cookies_filepath:  where to keep the session cookies between runs"""
+    if bwd.load_cookies(cookies_filepath):
+        print("Reusing the last session.")
 
+    # load the sign-in page
+    bwd.get("https://dribbble.com/session/new", force=True)
+    if not is_signed_out(bwd):
+        print("Already logged in.")
+        return
 
-        output_filename = cleaned_name + "." + file_type
-        output_folder = os.path.join("downloads", cleaned_name)
+    # log in
+    print("Logging in.")
+    username_input = bwd.get_elem("""document.getElementById("login")""")
+    password_input = bwd.get_elem("""document.getElementById("password")""")
+    bwd.send_keys(username_input, username, speed=0.01)
+    bwd.send_keys(password_input, password, speed=0.01)
+    bwd.js("""document.querySelector("input[value='Sign In']").click()""")
+
+    # wait to be sent away from the sign-in page before saving the new session
+    try:
+        bwd.get_elem("""window.location.pathname.startsWith("/session") ? null : true""", timeout=30)
+    except Exception:
+        print("Couldn't tell whether the login worked, so the session wasn't saved.")
+        return
+    bwd.save_cookies(cookies_filepath)
+
+
+def is_signed_out(bwd):
+    return bwd.js("return window.location.pathname").startswith("/session")
+
+
+@span("download")
+def download_source(source, i, total, manifest=None, on_downloaded=None):
+    """ download a single liked GIF or MP4 into its own folder, along with its credits.json
+
+    if a manifest is given, shots we already have are revalidated with a
+    conditional request and only downloaded again if they changed
+
+    if on_downloaded is given, it is called with the media's filepath
+    as soon as a new file (and its credits.json) is on disk
+
+    returns the number of bytes downloaded (0 if it was skipped)"""
+    # build output name
+    file_type = source["src"].split(".")[-1]
+    cleaned_name = slugify(source['name'])
+
+    # 
+    if cleaned_name is None:
+        return 0
+
+    output_filename = cleaned_name + "." + file_type
+    output_folder = os.path.join("downloads", cleaned_name)
 
-        # make folder if it doesn"t exist
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-        # if it does exist, skip it
-        else:
-            continue
+    # where to save it
+    filepath = f"{output_folder}/{output_filename}"
+    credits_filepath = os.path.join(output_folder, "credits.json")
 
-        # print debug info
-        print(f"{i}/{len(sources)} - Downloading {source['name']} by {source['author']}")
+    # credits.json is only written once the media file is complete,
+    # so if it exists we already have this shot
+    already_downloaded = os.path.exists(credits_filepath)
+    entry = manifest.get(source["src"]) if manifest is not None else None
 
-        # where to save it
-        filepath = f"{output_folder}/{output_filename}"
+    if already_downloaded:
+        # nothing to revalidate against
+        if manifest is None:
+            return 0
+
+        # downloaded before we kept a manifest, so remember what the server has now
+        if entry is None:
+            try:
+                validators = fetch_validators(source["src"])
+            except requests.RequestException:
+                return 0
+            if os.path.exists(filepath):
+                validators["sha256"] = hash_file(filepath)
+            manifest.record(source["src"], folder=cleaned_name, **validators)
+            return 0
+
+        # the server gave us nothing to send a conditional request with,
+        # so only download it again if a HEAD request reports a different size
+        if not entry.get("etag") and not entry.get("last_modified"):
+            try:
+                validators = fetch_validators(source["src"])
+            except requests.RequestException:
+                return 0
+            known_size = entry.get("size")
+            if known_size is None and os.path.exists(filepath):
+                known_size = os.path.getsize(filepath)
+            if validators["size"] is None or validators["size"] == known_size:
+                manifest.record(source["src"], etag=validators["etag"], last_modified=validators["last_modified"])
+                return 0
+
+    # make folder if it doesn't exist
+    os.makedirs(output_folder, exist_ok=True)
+
+    # the media finished downloading but we stopped before writing credits.json
+    if not already_downloaded and os.path.exists(filepath):
+        save_json_file(source, credits_filepath)
+        if on_downloaded is not None:
+            on_downloaded(filepath)
+        return 0
+
+    try:
+        # download it! (resumes from a previous .part file if there is one,
+        # and asks the server to skip it if our copy is still current)
+        result = download_file(
+            source["src"], filepath,
+            etag=entry.get("etag") if already_downloaded else None,
+            last_modified=entry.get("last_modified") if already_downloaded else None,
+        )
+    except (requests.RequestException, IOError) as e:
+        # skip errors, we'll pick it back up next run
+        print(f"Error with ({e}):")
+        pprint(source)
+        return 0
+
+    # "304 Not Modified"
+    if result.pop("not_modified"):
+        manifest.record(source["src"])
+        return 0
+
+    # print debug info
+    print(f"{i}/{total} - Downloaded {source['name']} by {source['author']}")
+
+    num_bytes = result.pop("bytes_written")
+    if manifest is not None:
+        manifest.record(source["src"], folder=cleaned_name, **result)
+
+    # save credits.json
+    save_json_file(source, credits_filepath)
+
+    # hand it off to whoever is waiting for it
+    if on_downloaded is not None:
+        on_downloaded(filepath)
+
+    return num_bytes
+
+
+def download_and_make_backgrounds(
+    username, password, workers=8, scraper="browser", browser_address=None,
+    jobs=1, ffmpeg_timeout=600, dedupe=False, queue_size=16, **options
+):
+    """ download your likes and turn them into wallpapers at the same time
+
+    each finished download is handed to the packagers through a bounded queue,
+    so ffmpeg and preview generation run while the network is busy with the next files
+
+    @browser_address:   attach the browser scraper to the running Chrome at this host:port
+    @jobs:              number of wallpapers to build at the same time, each in its own process
+    @ffmpeg_timeout:    kill a conversion after this number of seconds
+    @dedupe:            only keep one copy of animations that look the same (moving the others to duplicates/)
+                        (new downloads that look like something we have are dropped)
+    @queue_size:        number of downloaded files allowed to wait for packaging
+                        (downloads pause when the packagers fall this far behind)
+    @options:           passed on to make_background (output_format, max_height, colors)"""
+    media_queue = queue.Queue(maxsize=queue_size)
+    queued_folders = set()
+    queued_folders_lock = threading.Lock()
+    results = []
+
+    # collapse duplicates already in the library, then check new downloads against what's left
+    hash_cache = HashCache()
+    duplicate_index = DuplicateIndex()
+    if dedupe:
+        with span("dedupe"):
+            for filepath in dedupe_media_files(find_media_files(), hash_cache=hash_cache):
+                duplicate_index.add(filepath, hash_cache.get(filepath))
+
+    def enqueue(filepath):
+        # only package each wallpaper once (before dedup, which would otherwise
+        # see a wallpaper's converted file as a copy of the download it came from)
+        folder = os.path.dirname(filepath)
+        with queued_folders_lock:
+            if folder in queued_folders:
+                return
+            queued_folders.add(folder)
+
+        if dedupe:
+            try:
+                signature = hash_cache.get(filepath)
+            except Exception as e:
+                print(f"Could not hash '{filepath}': {e}")
+                signature = None
+
+            # the first copy of an animation to arrive is the one we keep
+            canonical = duplicate_index.claim(filepath, signature) if signature is not None else None
+            if canonical is not None:
+                mark_duplicate(filepath, canonical)
+                return
+
+        media_queue.put(filepath)
+
+    # the process pool is replaced if a worker dies, so the packagers share it through here
+    pool = {"executor": None, "restarts": 0}
+    pool_lock = threading.Lock()
+
+    def build(filepath):
+        executor = pool["executor"]
+        if executor is None:
+            return try_make_background(filepath, **options)
 
         try:
-            # download it!
-            urllib.request.urlretrieve(source["src"], filepath)
-
-            # save credits.json
-            save_json_file(source, os.path.join(output_folder, "credits.json"))
-        except urllib.error.HTTPError as e:
-            # skip errors
-            print("Error with:")
-            pprint(source)
-            pass
-    
-    print("Finished downloading.")
+            return executor.submit(try_make_background, filepath, **options).result()
+        except BrokenProcessPool as e:
+            # a worker process died (e.g. it ran out of memory), which breaks every job in the pool
+            with pool_lock:
+                if pool["executor"] is executor:
+                    executor.shutdown(wait=False)
+                    pool["restarts"] += 1
+                    if pool["restarts"] <= MAX_POOL_RESTARTS:
+                        print("A packaging process died, starting new ones.")
+                        pool["executor"] = make_process_pool(jobs, ffmpeg_timeout)
+                    else:
+                        print("Packaging processes keep dying, building the rest in this process.")
+                        configure_ffmpeg(timeout=ffmpeg_timeout)
+                        pool["executor"] = None
+            error = e
+        except Exception as e:
+            error = e
+
+        print(f"Error making a background from '{filepath}': {error}")
+        return {
+            "filepath": filepath, "error": f"{type(error).__name__}: {error}", "bytes_saved": 0, "rebuilt": []
+        }
+
+    def package_worker():
+        while True:
+            filepath = media_queue.get()
+            if filepath is None:
+                return
+
+            # errors are caught per wallpaper, otherwise the downloads would block forever
+            result = build(filepath)
+            with queued_folders_lock:
+                results.append(result)
+
+    # one packager thread per job, each waiting on its own process
+    if jobs > 1:
+        pool["executor"] = make_process_pool(jobs, ffmpeg_timeout)
+    else:
+        configure_ffmpeg(timeout=ffmpeg_timeout)
+    packagers = [threading.Thread(target=package_worker) for _ in range(max(1, jobs))]
+    for packager in packagers:
+        packager.start()
+
+    try:
+        download_dribbble_likes(
+            username, password, workers=workers, scraper=scraper,
+            on_downloaded=enqueue, browser_address=browser_address
+        )
+
+        # package everything that was downloaded on a previous run
+        for filepath in find_media_files():
+            enqueue(filepath)
+    finally:
+        for _ in packagers:
+            media_queue.put(None)
+        for packager in packagers:
+            packager.join()
+        if pool["executor"] is not None:
+            pool["executor"].shutdown()
+        hash_cache.save()
+
+    report_backgrounds(results)
 
 
 def slugify(value):
@@ -159,113 +509,403 @@ def slugify(value):
     return value
 
 
-def make_backgrounds():
-    # get all files to convert (in subfolders of the downloads folder)
+def find_media_files(downloads_folder="downloads"):
+    """ get all files to convert (in subfolders of the downloads folder) """
     files_to_convert = []
-    for subdir, dirs, _ in os.walk("downloads"):
+    for subdir, dirs, _ in os.walk(downloads_folder):
         for d in dirs:
                 for subsubdir, _, files in os.walk(os.path.join(subdir, d)):
                         for file in files:
                                 files_to_convert.append(os.path.join(subsubdir, file).replace("\\", "/"))
-    
-    for filepath in files_to_convert:
-        # get some required things
-        file_type = filepath.split(".")[-1]
-        media_folder = os.path.join(os.getcwd(), "/".join(filepath.split("/")[:-1]))
-        media_filename = filepath.split("/")[-1]
-
-        # skip non-gif and non-mp4 files
-        if file_type not in ["gif", "mp4"]:
-            continue
-
-        def escape(str):
-            return str.replace('"', '\\"').replace("\\", "\\\\")
-
-        # get the credits.json info
-        metadata = load_json_file(os.path.join(media_folder, "credits.json"))
-        metadata_name = escape(metadata.get("name"))
-        metadata_author = escape(metadata.get("author"))
-
-        # turn into a Wallpaper Engine web wallpaper
-        if file_type == "mp4":
-            # convert MP4 to WEBM
-            # (because Wallpaper Engine requires .webm)
-            print("Converting MP4 to GIF")
-            full_input_filename = os.path.join(media_folder, media_filename)
-            media_filename = media_filename.replace(".mp4", ".gif")
-            filepath = filepath.replace(".mp4", ".gif")
+
+    # only GIFs and videos become wallpapers
+    return [f for f in files_to_convert if f.split(".")[-1] in MEDIA_TYPES]
+
+
+def make_backgrounds(jobs=1, ffmpeg_timeout=600, dedupe=False, **options):
+    """ turn every downloaded GIF and video into a wallpaper
+
+    @jobs:              number of wallpapers to build at the same time, each in its own process
+    @ffmpeg_timeout:    kill a conversion after this number of seconds
+    @dedupe:            only keep one copy of animations that look the same (moving the others to duplicates/)
+    @options:           passed on to make_background (output_format, max_height, colors)"""
+    filepaths = find_media_files()
+    if dedupe:
+        with span("dedupe"):
+            filepaths = dedupe_media_files(filepaths)
+    build = partial(try_make_background, **options)
+
+    # build in parallel across cores (or serially, without starting any processes)
+    if jobs > 1:
+        with make_process_pool(jobs, ffmpeg_timeout) as executor:
+            results = list(executor.map(build, filepaths))
+    else:
+        configure_ffmpeg(timeout=ffmpeg_timeout)
+        results = [build(filepath) for filepath in filepaths]
+
+    report_backgrounds(results)
+
+
+def make_process_pool(jobs, ffmpeg_timeout):
+    """ a pool of processes that each run one ffmpeg job at a time,
+    with the machine's cores split evenly between them """
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(threads_for(jobs), ffmpeg_timeout, get_profiler() is not None)
+    )
+
+
+def init_worker(threads_per_job, ffmpeg_timeout, profile):
+    """ set up a packaging process (one ffmpeg job at a time, and profiling if the parent is profiling) """
+    configure_ffmpeg(1, threads_per_job, ffmpeg_timeout)
+    if profile:
+        # forked workers inherit the parent's profiler, so drop the spans it already has
+        # (otherwise they'd be sent back and counted again)
+        enable_profiling().take_spans()
+
+
+def try_make_background(filepath, **options):
+    """ make a single background, returning the error message instead of raising
+    so that one broken wallpaper doesn't stop the rest from being built """
+    result = {"filepath": filepath, "error": None, "bytes_saved": 0, "rebuilt": []}
+    try:
+        with span("make_background", filepath=filepath):
+            result.update(make_background(filepath, **options) or {})
+    except Exception as e:
+        print(f"Error making a background from '{filepath}': {e}")
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    # send the timings back if we're in a worker process
+    result["spans"] = take_worker_spans()
+    return result
+
+
+def report_backgrounds(results):
+    # collect the timings from the worker processes
+    for r in results:
+        spans = r.pop("spans", [])
+        if get_profiler() is not None:
+            get_profiler().add_spans(spans)
+
+    failures = [r for r in results if r["error"] is not None]
+    print(f"Made {len(results) - len(failures)}/{len(results)} background(s).")
+
+    up_to_date = [r for r in results if r["error"] is None and not r["rebuilt"]]
+    if up_to_date:
+        print(f"{len(up_to_date)} of them were already up to date.")
+
+    # downscaling to the max height (or re-encoding) can also make an animation bigger
+    bytes_saved = sum(r["bytes_saved"] for r in results if r["bytes_saved"] > 0)
+    if bytes_saved:
+        print(f"Shrinking animations saved {bytes_saved / (1024 * 1024):.1f} MB in total.")
+    grown = [r for r in results if r["bytes_saved"] < 0]
+    if grown:
+        bytes_added = -sum(r["bytes_saved"] for r in grown)
+        print(f"{len(grown)} animation(s) got bigger when downscaled or re-encoded, {bytes_added / 1024:.0f} KB in total:")
+        for r in grown:
+            print(f"    {r['filepath']} (+{-r['bytes_saved'] / 1024:.0f} KB)")
+
+    for r in failures:
+        print(f"    {r['filepath']} - {r['error']}")
+
+
+def make_background(filepath, output_format="gif", max_height=1080, colors=None):
+    """ turn a single downloaded GIF or video into a Wallpaper Engine web wallpaper
+
+    @output_format: "gif" to turn videos into GIFs,
+                    "video" to keep videos as videos (MP4 if it's H.264, otherwise WebM),
+                    "webp" or "avif" to turn GIFs and videos into animated WebPs or AVIFs
+    @max_height:    downscale animations taller than this (None to keep their size)
+    @colors:        quantize GIFs down to this many colors (lossy, None to keep them as they are)
+
+    only the outputs whose inputs changed since the last build are made again (see utils/build_record.py)
+
+    returns {"bytes_saved": <bytes saved by optimizing or re-encoding the animation (negative if it grew)>,
+             "rebuilt": <names of the build steps that had to run>}"""
+    # get some required things
+    file_type = filepath.split(".")[-1]
+    media_folder = os.path.join(os.getcwd(), "/".join(filepath.split("/")[:-1]))
+    media_filename = filepath.split("/")[-1]
+
+    # skip files that aren't GIFs or videos
+    if file_type not in MEDIA_TYPES:
+        return {}
+
+    # get the credits.json info
+    metadata = load_json_file(os.path.join(media_folder, "credits.json"))
+    metadata_name = metadata.get("name")
+    metadata_author = metadata.get("author")
+
+    # each step below is skipped if its inputs haven't changed since it was last built
+    record = BuildRecord(media_folder)
+    rebuilt = []
+
+    # turn into a Wallpaper Engine web wallpaper
+    full_input_filename = os.path.join(media_folder, media_filename)
+    bytes_saved = 0
+    if file_type in VIDEO_TYPES and output_format == "video":
+        # Chromium plays H.264 MP4s and WebMs natively, anything else becomes a WebM
+        if file_type == "mp4" and not record.is_fresh("codec", [full_input_filename]):
+            record.record("codec", [full_input_filename], value=probe_video_codec(full_input_filename))
+            rebuilt.append("codec")
+        if file_type == "mp4" and record.value("codec") != "h264":
+            print("Converting MP4 to WEBM")
+            media_filename = replace_extension(media_filename, "webm")
+            filepath = replace_extension(filepath, "webm")
             full_output_filename = os.path.join(media_folder, media_filename)
 
-            # use FFMPEG to convert
-            # the "-n" flag auto-skips converting if the output already exists
-            # the "-y" flag auto-converts if the output already exists (no prompt)
-            os.system(f'ffmpeg -y -i {full_input_filename} -vf "fps=30,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse" -loop 0 {full_output_filename}')
+            convert_video(full_input_filename, full_output_filename, [
+                "-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "32", "-row-mt", "1", "-an"
+            ])
 
             # remove mp4 file
             try:
                 os.remove(full_input_filename)
             except OSError:
                 pass
+    elif file_type in VIDEO_TYPES and output_format in ANIMATED_IMAGE_FORMATS:
+        print(f"Converting {file_type.upper()} to {output_format.upper()}")
+        media_filename = replace_extension(media_filename, output_format)
+        filepath = replace_extension(filepath, output_format)
+        full_output_filename = os.path.join(media_folder, media_filename)
+
+        with span("convert_image"):
+            sizes = convert_video_to_animated_image(full_input_filename, full_output_filename, max_height=max_height)
+        if sizes is not None:
+            size_before, size_after = sizes
+            bytes_saved = size_before - size_after
+            print_size_change("Converted", media_filename, size_before, size_after)
+
+        # remove video file
+        try:
+            os.remove(full_input_filename)
+        except OSError:
+            pass
+    elif file_type in VIDEO_TYPES:
+        print(f"Converting {file_type.upper()} to GIF")
+        media_filename = replace_extension(media_filename, "gif")
+        filepath = replace_extension(filepath, "gif")
+        full_output_filename = os.path.join(media_folder, media_filename)
+
+        # use FFMPEG to convert, and optimize the GIF before it goes in the cache
+        # (the scheduler overwrites existing outputs and kills hung conversions)
+        bytes_saved = convert_video(
+            full_input_filename, full_output_filename, GIF_FFMPEG_ARGS,
+            optimize={"max_height": max_height, "colors": colors}
+        )
+
+        # remove video file
+        try:
+            os.remove(full_input_filename)
+        except OSError:
+            pass
+
+    # re-encode GIFs as animated WebPs or AVIFs
+    if media_filename.split(".")[-1] == "gif" and output_format in ANIMATED_IMAGE_FORMATS:
+        print(f"Converting GIF to {output_format.upper()}")
+        input_filepath = filepath
+        media_filename = replace_extension(media_filename, output_format)
+        filepath = replace_extension(filepath, output_format)
+
+        with span("convert_image"):
+            size_before, size_after = convert_animated_image(input_filepath, filepath, max_height=max_height)
+        bytes_saved = size_before - size_after
+        print_size_change("Converted", media_filename, size_before, size_after)
+
+        # remove GIF file
+        try:
+            os.remove(input_filepath)
+        except OSError:
+            pass
 
-        # create preview.png
-        save_first_frame_of_gif(filepath, os.path.join(media_folder, "preview"))
-
-        # find color for background
-        background_color = get_image_background_color(filepath)
-
-        # load HTML template
-        with open("gif_template.html", "r", encoding="utf-8") as f:
-            gif_template = f.read()
-        
-        # format HTML template
-        gif_template = gif_template.replace("$FILENAME", media_filename)
-        gif_template = gif_template.replace("$COLOR", background_color)
-        gif_template = gif_template.replace("$TITLE", metadata_name)
-
-        # write HTML to file
-        with open(f"{media_folder}/index.html", "w", encoding="utf-8") as f:
-            f.write(gif_template)
-
-        # copy main.js into folder
-        shutil.copy(os.path.join(os.getcwd(), "gif_main.js"), media_folder)
-
-        # load project.json template
-        with open("project_template.json", "r", encoding="utf-8") as f:
-            project_template = f.read()
-
-        # format project.json template
-        project_template = project_template.replace("$DESCRIPTION", (
-            f"{metadata_name} was made by {metadata_author} on Dribbble. "
-            f"Check them out at {metadata['author_url']}"
-        ))
-        project_template = project_template.replace("$COLOR", background_color)
-        project_template = project_template.replace("$PREVIEW", "preview.png")
-        project_template = project_template.replace("$TITLE", metadata_name)
+    # videos get a <video> element, everything else an <img>
+    is_video = media_filename.split(".")[-1] in VIDEO_TYPES
+
+    credits_filepath = os.path.join(media_folder, "credits.json")
+
+    # shrink GIFs before anything reads them
+    optimize_params = {"max_height": max_height, "colors": colors}
+    if media_filename.split(".")[-1] == "gif" and not record.is_fresh("optimize", [filepath], optimize_params):
+        with span("optimize_gif"):
+            size_before, size_after = optimize_gif(filepath, max_height=max_height, colors=colors)
+        bytes_saved += size_before - size_after
+        if size_after != size_before:
+            print_size_change("Optimized", media_filename, size_before, size_after)
+        record.record("optimize", [filepath], optimize_params)
+        rebuilt.append("optimize")
+
+    html_template_filename = "video_template.html" if is_video else "gif_template.html"
+    main_js_filename = "video_main.js" if is_video else "gif_main.js"
+
+    # decode the first frame once for both the preview and the color
+    preview_filepath = os.path.join(media_folder, "preview.png")
+    preview_fresh = record.is_fresh("preview", [filepath], outputs=[preview_filepath])
+    color_fresh = record.is_fresh("color", [filepath])
+    if not (preview_fresh and color_fresh):
+        with MediaAnalysis(filepath) as analysis:
+            # create preview.png
+            if not preview_fresh:
+                with span("preview"):
+                    save_first_frame_of_gif(analysis, os.path.join(media_folder, "preview"))
+                record.record("preview", [filepath])
+                rebuilt.append("preview")
+
+            # find color for background
+            if not color_fresh:
+                with span("background_color"):
+                    record.record("color", [filepath], value=get_image_background_color(analysis))
+                rebuilt.append("color")
+    background_color = record.value("color")
+
+    with span("write_files"):
+        # write HTML to file (templates are only read and parsed once per process)
+        index_filepath = os.path.join(media_folder, "index.html")
+        index_inputs = [filepath, credits_filepath, html_template_filename]
+        index_params = {"filename": media_filename, "color": background_color}
+        if not record.is_fresh("index.html", index_inputs, index_params, outputs=[index_filepath]):
+            html_template = load_template(html_template_filename, "html")
+            with open(index_filepath, "w", encoding="utf-8") as f:
+                f.write(html_template.render(
+                    FILENAME=media_filename,
+                    COLOR=background_color,
+                    TITLE=metadata_name,
+                ))
+            record.record("index.html", index_inputs, index_params)
+            rebuilt.append("index.html")
+
+        # link main.js into folder
+        main_js_filepath = os.path.join(media_folder, main_js_filename)
+        if not record.is_fresh("main.js", [main_js_filename], outputs=[main_js_filepath]):
+            link_or_copy(os.path.join(os.getcwd(), main_js_filename), media_folder)
+            record.record("main.js", [main_js_filename])
+            rebuilt.append("main.js")
 
         # write project.json to file
-        with open(f"{media_folder}/project.json", "w", encoding="utf-8") as f:
-            f.write(project_template)
-
-def save_first_frame_of_gif(filepath, output_filename):
-    # open image
-    im = Image.open(filepath)
-
-    # transfer palette from GIF to image
-    palette = im.getpalette()
-    im.putpalette(palette)
-
-    # save first frame
-    new_im = Image.new("RGBA", im.size)
-    new_im.paste(im)
-    new_im.save(output_filename + ".png")
-
-def get_image_background_color(filepath):
-    # open GIF
-    im = Image.open(filepath)
-    rgb_im = im.convert("RGB")
-    
-    # get RGB values of top-left pixel
-    r, g, b = rgb_im.getpixel((0, 0))
+        project_filepath = os.path.join(media_folder, "project.json")
+        project_inputs = [credits_filepath, "project_template.json"]
+        project_params = {"color": background_color}
+        if not record.is_fresh("project.json", project_inputs, project_params, outputs=[project_filepath]):
+            project_template = load_template("project_template.json", "json")
+            with open(project_filepath, "w", encoding="utf-8") as f:
+                f.write(project_template.render(
+                    DESCRIPTION=(
+                        f"{metadata_name} was made by {metadata_author} on Dribbble. "
+                        f"Check them out at {metadata['author_url']}"
+                    ),
+                    COLOR=background_color,
+                    PREVIEW="preview.png",
+                    TITLE=metadata_name,
+                ))
+            record.record("project.json", project_inputs, project_params)
+            rebuilt.append("project.json")
+
+    record.save()
+    return {"bytes_saved": bytes_saved, "rebuilt": rebuilt}
+
+def convert_video(input_filename, output_filename, ffmpeg_args, optimize=None):
+    """ convert a video with ffmpeg, reusing an earlier identical conversion if there is one
+
+    the conversion is looked up by the input's bytes plus the ffmpeg arguments and output format,
+    so re-downloads and renamed shots are hardlinked from the cache instead of re-encoded
+
+    @optimize:  optimize_gif's settings (max_height, colors) to shrink a GIF with before it's cached,
+                so the cache holds the finished GIF instead of a second, unoptimized copy
+
+    returns the number of bytes optimizing the GIF saved (0 if the conversion was cached)"""
+    cache = ConversionCache()
+    key = cache.key(input_filename, {
+        "args": ffmpeg_args,
+        "format": output_filename.split(".")[-1],
+        "optimize": optimize,
+    })
+
+    if cache.fetch(key, output_filename):
+        print(f"Using cached conversion for '{os.path.basename(output_filename)}'")
+        return 0
+
+    with span("convert_video"):
+        run_ffmpeg(["-i", input_filename] + ffmpeg_args + [output_filename])
+
+    bytes_saved = 0
+    if optimize is not None and output_filename.split(".")[-1] == "gif":
+        with span("optimize_gif"):
+            size_before, size_after = optimize_gif(output_filename, **optimize)
+        bytes_saved = size_before - size_after
+        if size_after != size_before:
+            print_size_change("Optimized", os.path.basename(output_filename), size_before, size_after)
+
+    cache.store(key, output_filename)
+    return bytes_saved
+
+def convert_animated_image(input_filename, output_filename, max_height=1080):
+    """ re-encode an animated image with Pillow, reusing an earlier identical conversion if there is one
+
+    returns the size of the input and the output in bytes"""
+    cache = ConversionCache()
+    key = cache.key(input_filename, {
+        "max_height": max_height,
+        "format": output_filename.split(".")[-1],
+    })
+
+    if cache.fetch(key, output_filename):
+        print(f"Using cached conversion for '{os.path.basename(output_filename)}'")
+        return os.path.getsize(input_filename), os.path.getsize(output_filename)
+
+    sizes = convert_animation(input_filename, output_filename, max_height=max_height)
+    cache.store(key, output_filename)
+    return sizes
+
+def convert_video_to_animated_image(input_filename, output_filename, max_height=1080):
+    """ turn a video into an animated WebP or AVIF by way of a GIF, reusing an earlier identical conversion
+
+    only the finished file is cached, the GIF in between is deleted
+
+    returns the size of the GIF and the output in bytes, or None if the conversion was cached"""
+    cache = ConversionCache()
+    key = cache.key(input_filename, {
+        "args": GIF_FFMPEG_ARGS,
+        "max_height": max_height,
+        "format": output_filename.split(".")[-1],
+    })
+
+    if cache.fetch(key, output_filename):
+        print(f"Using cached conversion for '{os.path.basename(output_filename)}'")
+        return None
+
+    gif_filename = replace_extension(output_filename, "gif")
+    try:
+        with span("convert_video"):
+            run_ffmpeg(["-i", input_filename] + GIF_FFMPEG_ARGS + [gif_filename])
+        sizes = convert_animation(gif_filename, output_filename, max_height=max_height)
+    finally:
+        if os.path.exists(gif_filename):
+            os.remove(gif_filename)
+
+    cache.store(key, output_filename)
+    return sizes
+
+def print_size_change(action, filename, size_before, size_after):
+    """ e.g. "Optimized 'dog.gif', saved 120 KB (300 KB -> 180 KB)", or "grew by" if it got bigger """
+    change = size_before - size_after
+    result = f"saved {change / 1024:.0f} KB" if change >= 0 else f"grew by {-change / 1024:.0f} KB"
+    print(f"{action} '{filename}', {result} ({size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB)")
+
+def replace_extension(filename, extension):
+    return filename.rsplit(".", 1)[0] + "." + extension
+
+def save_first_frame_of_gif(media, output_filename):
+    """ save the first frame of the GIF as a PNG
+
+    @media: a filepath or a MediaAnalysis (to reuse its already-decoded first frame)"""
+    as_analysis(media).first_frame.save(output_filename + ".png")
+
+def get_image_background_color(media):
+    """ guess the background color of the GIF
+
+    @media: a filepath or a MediaAnalysis (to reuse its already-decoded first frame)"""
+    # the most common color along the edges of a few frames
+    r, g, b = dominant_border_color(media)
 
     return rgb_to_hex(r, g, b)
 
@@ -273,6 +913,19 @@ def rgb_to_hex(r, g, b):
     return "#{:02x}{:02x}{:02x}".format(r, g, b)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Turn your Dribbble likes into Wallpaper Engine backgrounds.")
+    parser.add_argument("--workers", type=int, default=8, help="number of files to download at the same time")
+    parser.add_argument("--jobs", type=int, default=1, help="number of wallpapers to build at the same time")
+    parser.add_argument("--dedupe", action="store_true", help="only make one wallpaper out of animations that look the same")
+    parser.add_argument("--ffmpeg-timeout", type=int, default=600, help="kill a conversion after this number of seconds")
+    parser.add_argument("--format", choices=["gif", "video", "webp", "avif"], default="gif", help="turn videos into GIFs, keep them as videos, or turn everything into animated WebPs or AVIFs")
+    parser.add_argument("--max-height", type=int, default=1080, help="downscale animations taller than this (0 to keep their size)")
+    parser.add_argument("--colors", type=int, default=None, help="quantize GIFs down to this many colors (lossy)")
+    parser.add_argument("--scraper", choices=["browser", "http"], default="browser", help="how to fetch the list of likes")
+    parser.add_argument("--browser", default=None, help="attach to a running Chrome at this host:port (see utils/browser_daemon.py)")
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None, help="time every stage and save a Chrome trace to this file (default profile.json)")
+    args = parser.parse_args()
+
     credentials_filename = "creds.json"
     creds = load_json_file(credentials_filename)
     username = creds.get("username")
@@ -281,8 +934,26 @@ if __name__ == "__main__":
     if not username:
         raise ValueError(f"You need to add your username to {credentials_filename}!")
 
-    if not password:
+    if not password and args.scraper == "browser":
         raise ValueError(f"You need to add your password to {credentials_filename}!")
 
-    download_dribbble_likes(username, password)
-    make_backgrounds()
+    if args.format in ANIMATED_IMAGE_FORMATS and not supports_animated_format(args.format):
+        raise ValueError(f"This version of Pillow can't write animated {args.format.upper()} files!")
+
+    if args.profile:
+        enable_profiling()
+
+    try:
+        with span("run"):
+            download_and_make_backgrounds(
+                username, password,
+                workers=args.workers, scraper=args.scraper, browser_address=args.browser,
+                jobs=args.jobs, output_format=args.format,
+                ffmpeg_timeout=args.ffmpeg_timeout, dedupe=args.dedupe,
+                max_height=args.max_height or None, colors=args.colors
+            )
+    finally:
+        if args.profile:
+            get_profiler().save_trace(args.profile)
+            get_profiler().print_summary()
+            print(f"Saved a trace of this run to '{args.profile}' (open it in chrome://tracing).")
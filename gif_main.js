@@ -10,14 +10,212 @@ let right1 = 100;
 let top2 = 0;
 let right2 = 100;
 
+// latest values from the property sliders, applied together on the next animation frame
+let size = null;
+let maxFps = 30;
+let updateScheduled = false;
+
+// we stop drawing if Wallpaper Engine paused us or the page is hidden
+let pausedByEngine = false;
+let hidden = false;
+let paused = false;
+
 const crop = () => {
-    document.getElementById("main-img").style["clip-path"] = `polygon(${left1}% ${top1}%, ${left2}% ${bottom1}%, ${right1}% ${bottom2}%, ${right2}% ${top2}%)`;
+    scheduleUpdate();
+}
+
+const scheduleUpdate = () => {
+    if (updateScheduled) {
+        return;
+    }
+    updateScheduled = true;
+    requestAnimationFrame(() => {
+        updateScheduled = false;
+        const element = document.getElementById("main-img");
+        if (size !== null) {
+            element.style.height = size + "px";
+        }
+        element.style["clip-path"] = `polygon(${left1}% ${top1}%, ${left2}% ${bottom1}%, ${right1}% ${bottom2}%, ${right2}% ${top2}%)`;
+    });
 }
 
+const IMAGE_TYPES = {gif: "image/gif", webp: "image/webp", avif: "image/avif"};
+
+// draws the GIF's frames onto a canvas ourselves, so we can cap the frame rate
+// and stop decoding entirely while the wallpaper isn't visible
+const player = {
+    decoder: null,
+    canvas: null,
+    context: null,
+    frameCount: 0,
+    durations: [],      // how long each frame lasts in ms, filled in as frames get decoded
+    frameIndex: 0,      // the frame on the canvas
+    frameEnd: 0,        // when the frame on the canvas should be replaced
+    nextTick: 0,        // when the draw loop should run next
+    pausedAt: null,
+    timer: null,
+    generation: 0,      // bumped on pause so stale draw loops stop
+
+    start: async (img) => {
+        if (!("ImageDecoder" in window)) {
+            return;     // the <img> keeps animating on its own
+        }
+
+        // local files don't always come with a Content-Type, so go by the extension
+        const src = img.getAttribute("src");
+        const extension = src.split(".").pop().toLowerCase();
+        const response = await fetch(src);
+        const type = IMAGE_TYPES[extension] || response.headers.get("Content-Type") || "image/gif";
+        player.decoder = new ImageDecoder({data: response.body, type: type});
+        await player.decoder.tracks.ready;
+        await player.decoder.completed;
+        player.frameCount = player.decoder.tracks.selectedTrack.frameCount;
+
+        // only the first frame is decoded up front, to size the canvas
+        const first = await player.decode(0);
+        player.canvas = document.createElement("canvas");
+        player.canvas.width = first.displayWidth;
+        player.canvas.height = first.displayHeight;
+
+        // swap the <img> for the canvas
+        player.canvas.id = img.id;
+        player.canvas.style.cssText = img.style.cssText;
+        player.canvas.style.display = "";
+        player.context = player.canvas.getContext("2d");
+        player.context.drawImage(first, 0, 0);
+        first.close();
+        img.replaceWith(player.canvas);
+
+        const now = performance.now();
+        player.frameEnd = now + player.durations[0];
+        player.nextTick = now;
+        if (paused) {
+            player.pausedAt = now;
+        } else {
+            player.tick(player.generation);
+        }
+    },
+
+    // decode a frame and remember how long it lasts (frame timings are in microseconds)
+    decode: async (frameIndex) => {
+        const result = await player.decoder.decode({frameIndex: frameIndex});
+        player.durations[frameIndex] = Math.max((result.image.duration || 100000) / 1000, 20);
+        return result.image;
+    },
+
+    // step forward to the frame that should be showing now, skipping any we're too late for
+    // (a frame's duration is only known once it's been decoded, so the first loop decodes every frame)
+    catchUp: async (now) => {
+        // don't race through a long backlog (e.g. after the browser throttled us)
+        if (now - player.frameEnd > 1000) {
+            player.frameEnd = now;
+        }
+
+        let image = null;
+        while (now >= player.frameEnd) {
+            if (image !== null) {
+                image.close();
+                image = null;
+            }
+            const next = (player.frameIndex + 1) % player.frameCount;
+            if (player.durations[next] === undefined) {
+                image = await player.decode(next);
+            }
+            player.frameIndex = next;
+            player.frameEnd += player.durations[next];
+        }
+        return image || await player.decode(player.frameIndex);
+    },
+
+    tick: (generation) => {
+        // wait for a real animation frame, then only decode if the frame changed
+        requestAnimationFrame(async () => {
+            if (generation !== player.generation) {
+                return;
+            }
+            const now = performance.now();
+            if (now >= player.frameEnd) {
+                const image = await player.catchUp(now);
+                if (generation !== player.generation) {
+                    image.close();
+                    return;
+                }
+                player.context.clearRect(0, 0, player.canvas.width, player.canvas.height);
+                player.context.drawImage(image, 0, 0);
+                image.close();
+            }
+
+            // wake up when the next frame is due, but at most maxFps times a second
+            // (counted from when this tick was due, so the animation frame and decoding don't slow it down)
+            player.nextTick = Math.max(player.frameEnd, player.nextTick + 1000 / maxFps, now);
+            if (generation === player.generation) {
+                player.timer = setTimeout(() => player.tick(generation), Math.max(0, player.nextTick - performance.now()));
+            }
+        });
+    },
+
+    pause: () => {
+        if (player.pausedAt !== null) {
+            return;
+        }
+        player.generation++;
+        clearTimeout(player.timer);
+        player.pausedAt = performance.now();
+    },
+
+    resume: () => {
+        if (player.pausedAt === null) {
+            return;
+        }
+        const pausedFor = performance.now() - player.pausedAt;
+        player.frameEnd += pausedFor;
+        player.nextTick += pausedFor;
+        player.pausedAt = null;
+        if (player.context) {
+            player.tick(player.generation);
+        }
+    },
+};
+
+const updatePaused = () => {
+    paused = pausedByEngine || hidden;
+    const img = document.querySelector("img#main-img");
+    if (img) {
+        // no canvas (yet), so hide the <img> to stop the browser animating it
+        img.style.display = paused ? "none" : "";
+    }
+    if (paused) {
+        player.pause();
+    } else {
+        player.resume();
+    }
+}
+
+document.addEventListener("visibilitychange", () => {
+    hidden = document.hidden;
+    updatePaused();
+});
+
+window.addEventListener("load", () => {
+    player.start(document.getElementById("main-img")).catch((e) => {
+        console.log("Falling back to <img> animation:", e);
+    });
+});
+
 window.wallpaperPropertyListener = {
+    setPaused: (isPaused) => {
+        pausedByEngine = isPaused;
+        updatePaused();
+    },
+
     applyUserProperties: (properties) => {
         if (properties.size) {
-            document.getElementById("main-img").style.height = properties.size.value + "px";
+            size = properties.size.value;
+            scheduleUpdate();
+        }
+
+        if (properties.fps) {
+            maxFps = Math.max(1, properties.fps.value);
         }
 
         if (properties["crop-left"]) {
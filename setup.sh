@@ -1,2 +1,2 @@
-sudo python3 -m pip install wheel opencv-python image selenium pypath-magic requests xmltodict
+sudo python3 -m pip install wheel opencv-python numpy image selenium pypath-magic requests xmltodict
 sudo -E env "PATH=$PATH" pypath add .
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+from PIL import Image, ImageDraw, ImageSequence
+
+from utils.dedup import DuplicateIndex, perceptual_hash
+
+
+def make_gif(filepath, background="white"):
+    """ a short GIF of a red circle moving over a flat background """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    frames = []
+    for i in range(8):
+        im = Image.new("RGB", (800, 600), background)
+        ImageDraw.Draw(im).ellipse([300 + i * 5, 200, 500 + i * 5, 400], fill="red")
+        frames.append(im)
+    frames[0].save(filepath, save_all=True, append_images=frames[1:], duration=50, loop=0)
+    return filepath
+
+
+def make_resized_copy(source, filepath):
+    """ the same GIF at half the size, re-encoded with fewer colors """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with Image.open(source) as im:
+        frames = [frame.convert("RGB").resize((400, 300)).quantize(32) for frame in ImageSequence.Iterator(im)]
+    frames[0].save(filepath, save_all=True, append_images=frames[1:], duration=50, loop=0)
+    return filepath
+
+
+def test_converted_file_is_not_a_duplicate_of_its_own_download(tmp_path):
+    # the packager turns x/x.gif into x/x.webp and deletes the GIF, then the
+    # final scan of the downloads folder finds the WebP
+    download = make_gif(str(tmp_path / "x" / "x.gif"))
+    converted = str(tmp_path / "x" / "x.webp")
+    Image.open(download).save(converted, save_all=True)
+
+    index = DuplicateIndex()
+    assert index.claim(download, perceptual_hash(download)) is None
+    os.remove(download)
+    assert index.claim(converted, perceptual_hash(converted)) is None
+
+
+def test_copy_in_another_folder_is_a_duplicate(tmp_path):
+    original = make_gif(str(tmp_path / "x" / "x.gif"))
+    copy = make_resized_copy(original, str(tmp_path / "y" / "y.gif"))
+
+    index = DuplicateIndex()
+    assert index.claim(original, perceptual_hash(original)) is None
+    assert index.claim(copy, perceptual_hash(copy)) == original
+
+
+def test_same_shape_on_another_background_is_not_a_duplicate(tmp_path):
+    red_on_white = make_gif(str(tmp_path / "x" / "x.gif"))
+    red_on_navy = make_gif(str(tmp_path / "y" / "y.gif"), background="navy")
+
+    index = DuplicateIndex()
+    assert index.claim(red_on_white, perceptual_hash(red_on_white)) is None
+    assert index.claim(red_on_navy, perceptual_hash(red_on_navy)) is None
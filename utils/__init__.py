@@ -1,6 +1,19 @@
+from .animated_image import *
+from .asset_manifest import *
 from .base_webdriver import *
+from .build_record import *
+from .conversion_cache import *
 from .decorators import *
+from .dedup import *
 from .download_utils import *
+from .ffmpeg_utils import *
+from .file_utils import *
 from .get_chrome_version import *
+from .gif_optimizer import *
 from .json_utils import *
+from .likes_scraper import *
+from .media_analysis import *
+from .media_downloads import *
+from .profiling import *
+from .templates import *
 from .webdriver_options import *
\ No newline at end of file
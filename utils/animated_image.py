@@ -0,0 +1,88 @@
+import os
+from PIL import Image, ImageSequence, features
+
+# older versions of Pillow can only read and write AVIF through this plugin
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+
+# formats GIFs can be re-encoded to, and the name Pillow knows them by
+ANIMATED_IMAGE_FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+
+
+def supports_animated_format(output_format):
+    """ whether this Pillow build can write the given animated format """
+    if output_format == "webp":
+        return features.check("webp")
+    Image.init()
+    return ANIMATED_IMAGE_FORMATS.get(output_format) in Image.SAVE_ALL
+
+
+def convert_animation(input_filepath, output_filepath, max_height=1080, quality=80):
+    """Re-encodes an animated image (e.g. a GIF) as an animated WebP or AVIF.
+
+    Unlike GIF, both formats store full color frames with modern lossy
+    compression, so the result is usually several times smaller.
+    Transparency and frame timings are kept.
+
+    Args:
+        input_filepath (str): The animation to convert.
+        output_filepath (str): Where to write it. The extension picks the format.
+        max_height (int, optional): Downscale frames taller than this, or None
+            to keep their size. Defaults to 1080.
+        quality (int, optional): The encoder quality from 0 to 100. Defaults to 80.
+
+    Returns:
+        tuple of int: The size of the file in bytes before and after.
+
+    Raises:
+        ValueError: If this Pillow build can't write the output format.
+
+    Examples:
+        >>> convert_animation("downloads/dog/dog.gif", "downloads/dog/dog.webp")
+        (307200, 61440)
+    """
+    output_format = output_filepath.split(".")[-1].lower()
+    if not supports_animated_format(output_format):
+        raise ValueError(
+            f"This version of Pillow can't write animated {output_format.upper()} files "
+            f"(for AVIF, upgrade Pillow or install pillow-avif-plugin)"
+        )
+
+    with Image.open(input_filepath) as im:
+        loop = im.info.get("loop", 0)
+        scale = 1
+        if max_height and im.height > max_height:
+            scale = max_height / im.height
+        new_size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+
+        frames = []
+        durations = []
+        for frame in ImageSequence.Iterator(im):
+            # browsers play GIF frames of 10ms or less at 100ms, so keep them looking the same
+            duration = frame.info.get("duration", 100)
+            durations.append(duration if duration > 10 else 100)
+
+            frame = frame.convert("RGBA")
+            if scale != 1:
+                frame = frame.resize(new_size, Image.LANCZOS)
+            frames.append(frame)
+
+    # write to a temporary file first so a failed encode doesn't leave a broken file behind
+    tmp_filepath = output_filepath + ".tmp." + output_format
+    options = {"quality": quality}
+    if output_format == "webp":
+        options.update(loop=loop, method=4)
+    frames[0].save(
+        tmp_filepath,
+        format=ANIMATED_IMAGE_FORMATS[output_format],
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        **options
+    )
+    os.replace(tmp_filepath, output_filepath)
+
+    return os.path.getsize(input_filepath), os.path.getsize(output_filepath)
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+class AssetManifest:
+    """A persistent record of every downloaded asset, keyed by its source URL.
+
+    Each entry remembers the ETag, Last-Modified, size and SHA-256 of the
+    file we got, so later runs can send conditional requests and skip
+    anything the server says hasn't changed.
+
+    The manifest is stored as JSON lines. Updates are appended one line at
+    a time (so a crash never loses earlier entries) and the last line for
+    a URL wins. Call `compact()` to rewrite it with one line per URL.
+
+    Examples:
+        >>> manifest = AssetManifest("downloads/manifest.jsonl")
+        >>> manifest.record("https://cdn.dribbble.com/a.gif", etag='"abc"', size=1024)
+        >>> manifest.get("https://cdn.dribbble.com/a.gif")["etag"]
+        '"abc"'
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """ read all entries from disk, ignoring a torn last line """
+        if not os.path.isfile(self.filepath):
+            return
+
+        with open(self.filepath, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry["src"]] = entry
+
+    def get(self, src):
+        """ get the entry for the given source URL (or None if we've never seen it) """
+        with self.lock:
+            return self.entries.get(src)
+
+    def record(self, src, **fields):
+        """ update the entry for the given source URL and append it to disk """
+        with self.lock:
+            entry = dict(self.entries.get(src, {}))
+            entry.update(fields)
+            entry["src"] = src
+            entry["checked_at"] = time.time()
+            self.entries[src] = entry
+
+            folder = os.path.dirname(self.filepath)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+
+            with open(self.filepath, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def compact(self):
+        """ rewrite the manifest with only the latest entry for each URL """
+        with self.lock:
+            tmp_filepath = self.filepath + ".tmp"
+            with open(tmp_filepath, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, sort_keys=True) + "\n")
+            os.replace(tmp_filepath, self.filepath)
+
+
+def hash_file(filepath, chunk_size=1024 * 1024):
+    """Computes the SHA-256 of a file without loading it all into memory.
+
+    Args:
+        filepath (str): The file to hash.
+        chunk_size (int, optional): The number of bytes to read at a time.
+            Defaults to 1 MB.
+
+    Returns:
+        str: The hex digest of the file's contents.
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -1,14 +1,86 @@
+import os
 import time
 import random
 from selenium import webdriver
+from selenium.common.exceptions import JavascriptException, SessionNotCreatedException, WebDriverException
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities# Do not wait for full page load
 
-from .download_utils import download_chromedriver
+from .download_utils import download_chromedriver, forget_chromedriver
+from .json_utils import load_json_file, save_json_file
 from .webdriver_options import get_chrome_options
 
 
+# file types a lean browser never downloads: images and video, then fonts
+LEAN_BLOCKED_EXTENSIONS = [
+    "gif", "png", "jpg", "jpeg", "webp", "avif", "svg", "ico", "mp4", "webm", "mov", "m3u8",
+    "woff", "woff2", "ttf", "otf", "eot",
+]
+
+# requests a lean browser never makes (see `BaseWebDriver.block_urls`)
+# (a pattern has to match the whole URL, so each extension is also blocked with a query string after it)
+LEAN_BLOCKED_URLS = [
+    pattern for extension in LEAN_BLOCKED_EXTENSIONS for pattern in (f"*.{extension}", f"*.{extension}?*")
+] + [
+    # analytics, ads and tracking
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*connect.facebook.com*",
+    "*hotjar.com*", "*segment.io*", "*segment.com/analytics*", "*sentry.io*",
+    "*bat.bing.com*", "*ads-twitter.com*", "*quantserve.com*", "*scorecardresearch.com*",
+]
+
+# upper bounds (in seconds) of the buckets in `BaseWebDriver.wait_latency_histogram`
+WAIT_LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf")]
+
+# resolves with the element as soon as the code finds it, checking after every DOM change
+# (the lookup code is pasted in as a function body in place of FIND_ELEMENT_CODE, rather than
+# compiled in the page with `new Function`, which a Content-Security-Policy without 'unsafe-eval' blocks)
+WAIT_FOR_ELEMENT_JS = """
+    const findArgs = arguments[0];
+    const timeoutMs = arguments[1];
+    const intervalMs = arguments[2];
+    const done = arguments[arguments.length - 1];
+
+    const find = function() {
+        FIND_ELEMENT_CODE
+    };
+
+    let finished = false;
+    const finish = (result) => {
+        if (finished) {
+            return;
+        }
+        finished = true;
+        observer.disconnect();
+        clearInterval(poll);
+        clearTimeout(deadline);
+        done(result);
+    };
+
+    const check = () => {
+        try {
+            const elem = find.apply(null, findArgs);
+            if (elem) {
+                finish({"found": true, "elem": elem});
+            }
+        } catch (e) {
+            finish({"error": String(e)});
+        }
+    };
+
+    const observer = new MutationObserver(check);
+    observer.observe(document, {"childList": true, "subtree": true, "attributes": true});
+    const poll = setInterval(check, intervalMs);
+    const deadline = setTimeout(() => finish({"found": false}), timeoutMs);
+
+    check();
+"""
+
+
 class BaseWebDriver:
-    def __init__(self, page_load_strategy="normal", **kwargs):
+    def __init__(self, page_load_strategy="normal", lean=False, debugger_address=None, **kwargs):
+        """ @lean:              skip downloading images, video, fonts and trackers (for scraping)
+        @debugger_address:  attach to the Chrome listening on this "host:port" instead of
+                            starting a new one (see utils/browser_daemon.py) """
 
         # download the chromedriver
         self.download()
@@ -21,20 +93,53 @@ class BaseWebDriver:
         # "none" means that it doesn't wait at all
         desired_capabilities["pageLoadStrategy"] = page_load_strategy
 
-        self.driver = webdriver.Chrome(
-            executable_path=self.chromedriver_filepath,
-            options=get_chrome_options(**kwargs),
-            desired_capabilities=desired_capabilities
-        )
+        options = get_chrome_options(lean=lean, debugger_address=debugger_address, **kwargs)
+        try:
+            self.driver = webdriver.Chrome(
+                executable_path=self.chromedriver_filepath,
+                options=options,
+                desired_capabilities=desired_capabilities
+            )
+        except SessionNotCreatedException as e:
+            # Chrome was updated in a way its fingerprint didn't catch, so get a matching chromedriver once
+            if "version" not in str(e).lower():
+                raise
+            print("chromedriver doesn't match the installed Chrome, downloading it again.")
+            forget_chromedriver()
+            self.download(force_download=True)
+            self.driver = webdriver.Chrome(
+                executable_path=self.chromedriver_filepath,
+                options=options,
+                desired_capabilities=desired_capabilities
+            )
 
         # change default loading timeout because sometimes it takes a while
         self.driver.set_page_load_timeout(120)
 
-    def download(self):
-        self.chromedriver_filepath = download_chromedriver()
+        # how long each `get_elem` call waited, in seconds
+        self.wait_latencies = []
+
+        # a browser we attached to is left running for the next run
+        self.attached = debugger_address is not None
+
+        if lean:
+            self.block_urls(LEAN_BLOCKED_URLS)
+
+    def download(self, force_download=False):
+        self.chromedriver_filepath = download_chromedriver(force_download=force_download)
+
+    def block_urls(self, patterns):
+        """ make the browser fail every request whose URL matches one of the patterns
+        (`*` matches anything), before anything is sent """
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
 
     def quit(self):
-        self.driver.quit()
+        if self.attached:
+            # only stop chromedriver, so the browser stays warm
+            self.driver.service.stop()
+        else:
+            self.driver.quit()
 
     def get(self, url, force=False):
         """ go to the given URL if we aren't currently there
@@ -74,6 +179,42 @@ class BaseWebDriver:
         """ Execute javascript code in the webdriver. """
         return self.driver.execute_script(code, *args)
 
+    def js_async(self, code, *args, timeout=30):
+        """ Execute asynchronous javascript code in the webdriver.
+
+        The code gets a callback as its last argument and must call it with the result.
+        @timeout:   give up after this number of seconds"""
+        self.driver.set_script_timeout(timeout)
+        return self.driver.execute_async_script(code, *args)
+
+    def save_cookies(self, filepath):
+        """ save every cookie the browser has (for all sites) so a later session can reuse them """
+        cookies = self.driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        save_json_file(cookies, filepath)
+
+        # these are as good as a password
+        if os.name != "nt":
+            os.chmod(filepath, 0o600)
+
+    def load_cookies(self, filepath):
+        """ put cookies saved with `save_cookies` back into the browser,
+        without having to visit their sites first
+
+        returns whether there were any cookies to load"""
+        if not os.path.isfile(filepath):
+            return False
+        cookies = load_json_file(filepath)
+
+        # Network.getAllCookies and Network.setCookies disagree on a few fields
+        for cookie in cookies:
+            for field in ["size", "session", "priority", "sameParty", "sourceScheme", "sourcePort", "partitionKey"]:
+                cookie.pop(field, None)
+            if cookie.get("expires", -1) < 0:
+                cookie.pop("expires", None)
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        return bool(cookies)
+
     def send_keys(self, element, text, speed=0.08):
         """ Send keys at a determined rate. """
         # focus the element
@@ -108,37 +249,67 @@ class BaseWebDriver:
         self.driver.switch_to.default_content()
 
     def get_elem(self, js_code, *args, interval=0.25, timeout=10):
-        """ wait until the given xpath returns an element, or until we reach the timeout
+        """ wait until the given javascript returns an element, or until we reach the timeout
+
+        the check runs inside the page whenever the DOM changes, so this returns
+        as soon as the element appears instead of on the next poll
 
         @js_code:   code to retrieve element (e.g. "document.getElementById('password')")
-        @interval:  number of seconds to wait in between checks
+        @interval:  also check this often (in seconds), for changes that don't touch the DOM
         @timeout:   give up after this number of seconds has elapsed"""
 
-        elem = None
-        total_time_elapsed = 0
-
         # add return statement if it isn't there
         if not js_code.startswith("return"):
             js_code = f"return {js_code}"
-        print(f"fetching element from {js_code}")
 
-        # quit loop if we have found the element or reached the timeout
-        while (not elem) and (total_time_elapsed < timeout):
+        script = WAIT_FOR_ELEMENT_JS.replace("FIND_ELEMENT_CODE", js_code)
+
+        start_time = time.monotonic()
+        deadline = start_time + timeout
+        while time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
             try:
-                elem = self.js(js_code, *args)
-            # BUG ignores invalid javascript code errors
-            except Exception:
-                pass
-            if not elem:
-                print(f"didn't find element, sleeping {interval} second(s)")
-                total_time_elapsed += interval
-                time.sleep(interval)
-
-        # raise exception if timed out
-        if (total_time_elapsed >= timeout):
-            raise Exception(f"Could not find web element at '{js_code}'")
-        else:
-            return elem
+                result = self.js_async(
+                    script, list(args), remaining * 1000, interval * 1000,
+                    timeout=remaining + 5
+                )
+            except WebDriverException as e:
+                # mistakes in the code shouldn't look like a missing element
+                if isinstance(e, JavascriptException) and "SyntaxError" in str(e):
+                    raise JavascriptException(f"Error in '{js_code}': {e.msg}")
+
+                # the page navigated away while we were waiting, so check again on the new one
+                time.sleep(min(interval, max(0, deadline - time.monotonic())))
+                continue
+
+            # neither should errors the code throws while running
+            if result.get("error"):
+                raise JavascriptException(f"Error in '{js_code}': {result['error']}")
+            if result.get("found"):
+                self.wait_latencies.append(time.monotonic() - start_time)
+                return result["elem"]
+            break
+
+        self.wait_latencies.append(time.monotonic() - start_time)
+        raise Exception(f"Could not find web element at '{js_code}'")
+
+    def wait_latency_histogram(self):
+        """ how many `get_elem` calls took up to each number of seconds """
+        histogram = {}
+        for bucket in WAIT_LATENCY_BUCKETS:
+            histogram[bucket] = 0
+        for latency in self.wait_latencies:
+            bucket = next(b for b in WAIT_LATENCY_BUCKETS if latency <= b)
+            histogram[bucket] += 1
+        return histogram
+
+    def report_wait_latencies(self):
+        if not self.wait_latencies:
+            return
+        print(f"Waited for {len(self.wait_latencies)} element(s), {sum(self.wait_latencies):.2f}s in total:")
+        for bucket, count in self.wait_latency_histogram().items():
+            if count:
+                print(f"    <= {bucket}s: {count}")
 
     def scroll_by(self, pixels):
         self.driver.execute_script(f'window.scrollBy({{top: {pixels}, behavior: "smooth"}});')
@@ -0,0 +1,182 @@
+import os
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import requests
+
+from .get_chrome_version import chrome_binary_path
+
+
+def browser_info(address, timeout=2):
+    """Asks a Chrome remote-debugging endpoint who it is.
+
+    Args:
+        address (str): The "host:port" Chrome is listening on.
+        timeout (float, optional): Seconds to wait for an answer. Defaults to 2.
+
+    Returns:
+        dict: Chrome's /json/version answer, or None if nothing healthy is listening.
+
+    Examples:
+        >>> browser_info("127.0.0.1:9222")
+        {'Browser': 'HeadlessChrome/78.0.3904.97', 'Protocol-Version': '1.3', ...}
+    """
+    try:
+        r = requests.get(f"http://{address}/json/version", timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def find_chrome():
+    """ the Chrome executable to launch """
+    path = chrome_binary_path()
+    if path is None and platform.system() == "Windows":
+        path = shutil.which("chrome") or os.path.expandvars(
+            r"%ProgramFiles%\Google\Chrome\Application\chrome.exe"
+        )
+    if path is None or not os.path.isfile(path):
+        raise FileNotFoundError("Could not find Chrome to launch!")
+    return path
+
+
+class BrowserDaemon:
+    """Keeps one warm Chrome running that `BaseWebDriver` can attach to.
+
+    Chrome is started with a remote-debugging port and its own profile
+    folder, so its cache and cookies survive between runs. It is checked
+    every `check_interval` seconds and restarted if it has died or stopped
+    answering.
+
+    Args:
+        port (int, optional): The remote-debugging port. Defaults to 9222.
+        user_data_dir (str, optional): The Chrome profile to use.
+            Defaults to "cache/browser-profile".
+        headless (bool, optional): Run without a window. Defaults to True.
+        check_interval (float, optional): Seconds between health checks. Defaults to 10.
+
+    Examples:
+        >>> daemon = BrowserDaemon()
+        >>> daemon.start()
+        '127.0.0.1:9222'
+        >>> bwd = BaseWebDriver(debugger_address=daemon.address)
+    """
+
+    def __init__(
+        self, port=9222, user_data_dir=os.path.join("cache", "browser-profile"),
+        headless=True, check_interval=10
+    ):
+        self.port = port
+        self.user_data_dir = os.path.abspath(user_data_dir)
+        self.headless = headless
+        self.check_interval = check_interval
+        self.process = None
+        self.restarts = 0
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.port}"
+
+    def command(self):
+        command = [
+            find_chrome(),
+            f"--remote-debugging-port={self.port}",
+            "--remote-debugging-address=127.0.0.1",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--disable-notifications",
+            "--disable-dev-shm-usage",
+            "--no-sandbox",
+        ]
+        if self.headless:
+            command.append("--headless")
+        return command + ["about:blank"]
+
+    def is_healthy(self):
+        """ whether our Chrome is still running and answering on its debugging port """
+        if self.process is not None and self.process.poll() is not None:
+            return False
+        return browser_info(self.address) is not None
+
+    def start(self, timeout=30):
+        """Starts Chrome (unless a healthy one is already listening on the port).
+
+        Args:
+            timeout (float, optional): Seconds to wait for Chrome to answer. Defaults to 30.
+
+        Returns:
+            str: The address to attach to.
+
+        Raises:
+            TimeoutError: If Chrome doesn't answer in time.
+        """
+        if browser_info(self.address) is not None:
+            return self.address
+
+        os.makedirs(self.user_data_dir, exist_ok=True)
+        self.process = subprocess.Popen(
+            self.command(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.is_healthy():
+                print(f"Chrome is listening on {self.address}.")
+                return self.address
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.2)
+
+        self.stop()
+        raise TimeoutError(f"Chrome didn't start listening on {self.address}")
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        print(f"Restarting Chrome (restart #{self.restarts}).")
+        return self.start()
+
+    def run_forever(self):
+        """ keep Chrome alive until interrupted, restarting it whenever a health check fails """
+        self.start()
+        try:
+            while True:
+                time.sleep(self.check_interval)
+                if not self.is_healthy():
+                    try:
+                        self.restart()
+                    except (OSError, TimeoutError) as e:
+                        print(f"Couldn't restart Chrome: {e}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep a warm Chrome running for create_backgrounds.py --browser.")
+    parser.add_argument("--port", type=int, default=9222, help="the remote-debugging port to listen on")
+    parser.add_argument("--user-data-dir", default=os.path.join("cache", "browser-profile"), help="the Chrome profile to use")
+    parser.add_argument("--show", action="store_true", help="show the browser window instead of running headless")
+    parser.add_argument("--check-interval", type=float, default=10, help="seconds between health checks")
+    args = parser.parse_args()
+
+    BrowserDaemon(
+        port=args.port, user_data_dir=args.user_data_dir,
+        headless=not args.show, check_interval=args.check_interval
+    ).run_forever()
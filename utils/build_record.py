@@ -0,0 +1,120 @@
+import os
+
+from .asset_manifest import hash_file
+from .json_utils import load_json_file, save_json_file
+
+
+def file_signature(filepath):
+    """ the size, modification time and SHA-256 of a file """
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": hash_file(filepath)}
+
+
+class BuildRecord:
+    """Remembers what each output of a wallpaper folder was built from.
+
+    Every build step (e.g. "preview" or "index.html") records the size,
+    modification time and hash of its input files, the parameters it was
+    built with and, optionally, a value it computed (like the background
+    color). On the next build a step only runs again if it is stale: an
+    input changed, the parameters changed or one of its outputs is missing.
+
+    Inputs are recorded relative to the wallpaper folder, so moving the
+    whole checkout (or running from another working directory) doesn't make
+    every step stale.
+
+    Checking a step only stats its inputs. A file is only hashed when its
+    size matches but its modification time doesn't (e.g. it was touched or
+    copied), so an unchanged file with a new mtime doesn't trigger a rebuild.
+
+    Args:
+        folder (str): The wallpaper folder.
+        filename (str, optional): The record's filename inside the folder.
+            Defaults to "build.json".
+
+    Examples:
+        >>> record = BuildRecord("downloads/dog")
+        >>> inputs = ["downloads/dog/dog.gif"]
+        >>> if not record.is_fresh("color", inputs):
+        ...     record.record("color", inputs, value=get_image_background_color("downloads/dog/dog.gif"))
+        >>> record.value("color")
+        '#ffd666'
+        >>> record.save()
+    """
+
+    def __init__(self, folder, filename="build.json"):
+        self.folder = folder
+        self.filepath = os.path.join(folder, filename)
+        self.steps = {}
+        self.changed = False
+        if os.path.isfile(self.filepath):
+            try:
+                self.steps = load_json_file(self.filepath)
+            except ValueError:
+                # a broken record just means building everything again
+                self.steps = {}
+
+    def is_fresh(self, step, inputs, params=None, outputs=()):
+        """Checks whether a step's outputs are still up to date.
+
+        Args:
+            step (str): The name of the step.
+            inputs (list of str): The files the step reads.
+            params (optional): Anything else the output depends on. Must
+                survive a round trip through JSON unchanged.
+            outputs (list of str, optional): The files the step writes.
+
+        Returns:
+            bool: True if the step can be skipped.
+        """
+        entry = self.steps.get(step)
+        keys = [self.key(path) for path in inputs]
+        if entry is None or entry["params"] != params or sorted(entry["inputs"]) != sorted(keys):
+            return False
+        if not all(os.path.exists(output) for output in outputs):
+            return False
+        return all(self.input_unchanged(entry["inputs"][key], path) for key, path in zip(keys, inputs))
+
+    def key(self, path):
+        """ how an input is named in the record: its path relative to the wallpaper folder """
+        return os.path.relpath(path, self.folder).replace(os.sep, "/")
+
+    def input_unchanged(self, signature, filepath):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        if stat.st_size != signature["size"]:
+            return False
+        if stat.st_mtime_ns == signature["mtime_ns"]:
+            return True
+
+        # same size but a new mtime, so look at the contents
+        if hash_file(filepath) != signature["sha256"]:
+            return False
+        signature["mtime_ns"] = stat.st_mtime_ns
+        self.changed = True
+        return True
+
+    def record(self, step, inputs, params=None, value=None):
+        """ remember that a step was just built from the given inputs """
+        self.steps[step] = {
+            "inputs": {self.key(path): file_signature(path) for path in inputs},
+            "params": params,
+            "value": value,
+        }
+        self.changed = True
+
+    def value(self, step):
+        """ the value a step computed when it was last built """
+        return self.steps[step]["value"]
+
+    def save(self):
+        if not self.changed:
+            return
+
+        # write to a temporary file first so a crash can't leave a half-written record
+        tmp_filepath = self.filepath + ".tmp"
+        save_json_file(self.steps, tmp_filepath)
+        os.replace(tmp_filepath, self.filepath)
+        self.changed = False
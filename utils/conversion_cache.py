@@ -0,0 +1,63 @@
+import os
+import json
+import hashlib
+import threading
+
+from .asset_manifest import hash_file
+from .file_utils import link_or_copy
+
+
+class ConversionCache:
+    """A content-addressed store of finished conversions.
+
+    Each result is keyed by the SHA-256 of the source file's bytes plus the
+    parameters of the conversion, so the same animation downloaded under a
+    different name (or converted again after a rebuild) is served by a
+    hardlink instead of running ffmpeg again.
+
+    Args:
+        folder (str, optional): Where to keep the cached files.
+            Defaults to "cache/conversions".
+
+    Examples:
+        >>> cache = ConversionCache()
+        >>> key = cache.key("downloads/dog/dog.mp4", {"format": "gif", "fps": 30})
+        >>> cache.fetch(key, "downloads/dog/dog.gif")
+        False
+        >>> cache.store(key, "downloads/dog/dog.gif")  # after converting
+        >>> cache.fetch(key, "downloads/doggo/doggo.gif")
+        True
+    """
+
+    def __init__(self, folder=os.path.join("cache", "conversions")):
+        self.folder = folder
+        self.lock = threading.Lock()
+
+    def key(self, source_filepath, params):
+        """ the cache key for converting the given file with the given parameters """
+        sha256 = hashlib.sha256()
+        sha256.update(hash_file(source_filepath).encode("utf-8"))
+        sha256.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return sha256.hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.folder, key[:2], f"{key}.{extension}")
+
+    def fetch(self, key, output_filepath):
+        """ put the cached result at `output_filepath`, returning whether there was one """
+        cached_filepath = self.path(key, output_filepath.split(".")[-1])
+        if not os.path.isfile(cached_filepath):
+            return False
+        link_or_copy(cached_filepath, output_filepath)
+        return True
+
+    def store(self, key, output_filepath):
+        """ add a finished conversion to the cache """
+        cached_filepath = self.path(key, output_filepath.split(".")[-1])
+        with self.lock:
+            os.makedirs(os.path.dirname(cached_filepath), exist_ok=True)
+
+            # link under a temporary name first so readers never see a partial file
+            tmp_filepath = cached_filepath + f".{os.getpid()}.tmp"
+            link_or_copy(output_filepath, tmp_filepath)
+            os.replace(tmp_filepath, cached_filepath)
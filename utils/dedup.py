@@ -0,0 +1,299 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+from .json_utils import load_json_file, save_json_file
+from .media_analysis import MediaAnalysis
+
+
+# wallpaper files that only make sense next to the media file
+GENERATED_FILES = ["index.html", "project.json", "preview.png", "gif_main.js", "video_main.js", "build.json"]
+
+
+# how many bits a signature's perceptual hash has (see `frame_hash`)
+HASH_BITS = 255
+
+
+def frame_hash(frame):
+    """Computes the 255-bit DCT perceptual hash (pHash) of one RGB frame.
+
+    The frame is shrunk to 32x32 grayscale pixels and transformed with a
+    DCT. Each bit records whether one of the 16x16 lowest frequencies
+    (without the overall brightness) is above their median, so the hash
+    describes the shapes in the frame and survives rescaling and
+    recompression.
+
+    Args:
+        frame (numpy.ndarray): An (height, width, 3) RGB array.
+
+    Returns:
+        tuple: The hash as an int, and how much detail it is based on
+            (the mean size of the frequencies, near 0 for a blank frame).
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    frequencies = cv2.dct(small)[:16, :16].flatten()[1:]
+    bits = frequencies > np.median(frequencies)
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big") >> (8 - HASH_BITS % 8) % 8
+    return value, float(np.abs(frequencies).mean())
+
+
+def color_signature(frame):
+    """ the average color of each cell of a 4x4 grid over the frame, as 48 ints """
+    return cv2.resize(frame, (4, 4), interpolation=cv2.INTER_AREA).astype(int).flatten().tolist()
+
+
+def perceptual_hash(media_filepath, num_frames=3):
+    """Computes the perceptual signature of an animation.
+
+    A few frames from the start of the animation are hashed with `frame_hash`
+    and combined by a per-bit majority vote, and their `color_signature`s
+    are averaged, so two animations only match if both their shapes and
+    their colors do.
+
+    Args:
+        media_filepath (str): The GIF or video to hash.
+        num_frames (int, optional): How many frames to sample. Defaults to 3.
+
+    Returns:
+        dict: The "hash" (as a hex string), the "colors" and whether the hash
+            is "informative" enough to count as evidence of a duplicate.
+    """
+    hashes = []
+    details = []
+    colors = []
+    with MediaAnalysis(media_filepath) as analysis:
+        for frame in analysis.sample_frames(num_frames, within=num_frames * 4):
+            value, detail = frame_hash(frame)
+            hashes.append(value)
+            details.append(detail)
+            colors.append(color_signature(frame))
+
+    bits = np.array([[(h >> i) & 1 for i in range(HASH_BITS)] for h in hashes])
+    majority = bits.sum(axis=0) * 2 >= len(hashes)
+    value = sum(1 << i for i in range(HASH_BITS) if majority[i])
+
+    # blank or nearly flat frames hash to mostly zeros, which says nothing about the animation
+    ones = bin(value).count("1")
+    informative = min(details) >= 1.0 and HASH_BITS // 8 <= ones <= HASH_BITS - HASH_BITS // 8
+
+    return {
+        "hash": format(value, "x"),
+        "colors": np.rint(np.mean(colors, axis=0)).astype(int).tolist(),
+        "informative": bool(informative),
+    }
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def color_distance(a, b):
+    """ the mean difference between two color signatures, per channel (0 to 255) """
+    return float(np.abs(np.array(a) - np.array(b)).mean())
+
+
+def is_duplicate(a, b, max_distance=24, max_color_distance=10):
+    """ whether two signatures from `perceptual_hash` are the same animation """
+    if not (a["informative"] and b["informative"]):
+        return False
+    return (
+        hamming_distance(int(a["hash"], 16), int(b["hash"], 16)) <= max_distance
+        and color_distance(a["colors"], b["colors"]) <= max_color_distance
+    )
+
+
+class DuplicateIndex:
+    """Finds near-duplicate signatures without comparing every pair.
+
+    Each hash is split into `max_distance + 1` bands. Two hashes that
+    differ in at most `max_distance` bits must agree exactly on at least one
+    band, so only signatures sharing a band bucket ever get compared
+    (see `is_duplicate` for the full comparison).
+
+    Args:
+        max_distance (int, optional): The largest Hamming distance between
+            hashes that still counts as a duplicate. Defaults to 24.
+        max_color_distance (float, optional): The largest `color_distance`
+            that still counts as a duplicate. Defaults to 10.
+
+    Examples:
+        >>> index = DuplicateIndex()
+        >>> index.add("downloads/dog/dog.gif", perceptual_hash("downloads/dog/dog.gif"))
+        >>> index.find(perceptual_hash("downloads/dog-teaser/dog-teaser.mp4"))
+        'downloads/dog/dog.gif'
+    """
+
+    def __init__(self, max_distance=24, max_color_distance=10):
+        self.max_distance = max_distance
+        self.max_color_distance = max_color_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = -(-HASH_BITS // self.num_bands)
+        self.buckets = [{} for _ in range(self.num_bands)]
+        self.signatures = {}
+        self.lock = threading.Lock()
+
+    def bands(self, signature):
+        value = int(signature["hash"], 16)
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (i * self.band_bits)) & mask for i in range(self.num_bands)]
+
+    def find_all(self, signature):
+        """ the keys of all indexed signatures that are duplicates of this one """
+        with self.lock:
+            return self._find_all(signature)
+
+    def _find_all(self, signature):
+        if not signature["informative"]:
+            return []
+
+        matches = []
+        for band, bucket in zip(self.bands(signature), self.buckets):
+            for key in bucket.get(band, []):
+                if key not in matches and is_duplicate(
+                    signature, self.signatures[key], self.max_distance, self.max_color_distance
+                ):
+                    matches.append(key)
+        return matches
+
+    def find(self, signature):
+        """ the key of the first indexed signature that is a duplicate of this one (or None) """
+        matches = self.find_all(signature)
+        return matches[0] if matches else None
+
+    def add(self, key, signature):
+        with self.lock:
+            self._add(key, signature)
+
+    def _add(self, key, signature):
+        self.signatures[key] = signature
+        for band, bucket in zip(self.bands(signature), self.buckets):
+            bucket.setdefault(band, []).append(key)
+
+    def claim(self, key, signature):
+        """Adds a media file unless it duplicates one from another wallpaper folder.
+
+        A wallpaper's own files never count as duplicates of each other, so a
+        GIF or WebP converted from a video that is already in the index is
+        recognized as the same wallpaper. Checking and adding happen under
+        one lock, so of two copies arriving at once only one is kept.
+
+        Args:
+            key (str): The media file's path.
+            signature (dict): Its signature from `perceptual_hash`.
+
+        Returns:
+            str: The path of the file in another folder this is a duplicate of,
+                or None if it was added to the index.
+        """
+        folder = os.path.dirname(key)
+        with self.lock:
+            for match in self._find_all(signature):
+                if os.path.dirname(match) != folder:
+                    return match
+            self._add(key, signature)
+        return None
+
+
+class HashCache:
+    """ remembers perceptual signatures on disk so unchanged files aren't decoded again """
+
+    def __init__(self, filepath=os.path.join("cache", "perceptual_signatures.json")):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.hashes = load_json_file(filepath) if os.path.isfile(filepath) else {}
+
+    def get(self, media_filepath):
+        stat = os.stat(media_filepath)
+        with self.lock:
+            entry = self.hashes.get(media_filepath)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["signature"]
+
+        signature = perceptual_hash(media_filepath)
+        with self.lock:
+            self.hashes[media_filepath] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "signature": signature}
+        return signature
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            save_json_file(self.hashes, self.filepath)
+
+
+def mark_duplicate(media_filepath, canonical_filepath, quarantine_folder="duplicates"):
+    """Moves a duplicate wallpaper's media out of the library but keeps its credits.json.
+
+    The media and any generated wallpaper files are moved to the same
+    folder name inside `quarantine_folder`, so nothing is ever deleted:
+    move them back to restore the wallpaper. The credits get a
+    "duplicate_of" entry pointing at the folder that kept its media.
+
+    Args:
+        media_filepath (str): The duplicate media file to set aside.
+        canonical_filepath (str): The media file that is being kept.
+        quarantine_folder (str, optional): Where to move duplicates.
+            Defaults to "duplicates".
+    """
+    folder = os.path.dirname(media_filepath)
+    credits_filepath = os.path.join(folder, "credits.json")
+    quarantine = os.path.join(quarantine_folder, os.path.basename(folder))
+    os.makedirs(quarantine, exist_ok=True)
+
+    for filename in [os.path.basename(media_filepath)] + GENERATED_FILES:
+        try:
+            os.replace(os.path.join(folder, filename), os.path.join(quarantine, filename))
+        except OSError:
+            pass
+
+    if os.path.isfile(credits_filepath):
+        credits = load_json_file(credits_filepath)
+        credits["duplicate_of"] = os.path.basename(os.path.dirname(canonical_filepath))
+        save_json_file(credits, credits_filepath)
+
+    print(f"'{media_filepath}' is a duplicate of '{canonical_filepath}', moved it to '{quarantine}'.")
+
+
+def dedupe_media_files(media_filepaths, max_distance=24, hash_cache=None):
+    """Collapses near-duplicate animations down to one media file each.
+
+    Files are visited from biggest to smallest (the biggest is usually the
+    full version rather than a teaser). Each one is compared against the
+    files kept so far and set aside if it is a duplicate of one of them
+    (see `mark_duplicate`), otherwise it is kept. Files are only ever
+    compared with a kept file, so a chain of slightly different animations
+    can't pull in files that don't look like the one that was kept.
+
+    Args:
+        media_filepaths (list of str): The media files to check.
+        max_distance (int, optional): See `DuplicateIndex`. Defaults to 24.
+        hash_cache (HashCache, optional): Where to remember signatures.
+            Defaults to the on-disk cache in "cache/".
+
+    Returns:
+        list of str: The media files that were kept, in their original order.
+    """
+    if hash_cache is None:
+        hash_cache = HashCache()
+
+    index = DuplicateIndex(max_distance=max_distance)
+    kept = set()
+
+    for filepath in sorted(media_filepaths, key=lambda f: (-os.path.getsize(f), f)):
+        try:
+            signature = hash_cache.get(filepath)
+        except Exception as e:
+            print(f"Could not hash '{filepath}': {e}")
+            kept.add(filepath)
+            continue
+
+        canonical = index.find(signature)
+        if canonical is None:
+            index.add(filepath, signature)
+            kept.add(filepath)
+        else:
+            mark_duplicate(filepath, canonical)
+
+    hash_cache.save()
+    return [f for f in media_filepaths if f in kept]
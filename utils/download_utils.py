@@ -4,7 +4,8 @@ import requests
 import zipfile
 import subprocess
 
-from .get_chrome_version import required_chromedriver_version
+from .get_chrome_version import chrome_fingerprint, required_chromedriver_version
+from .json_utils import load_json_file, save_json_file
 
 def download_ngrok(force_download=False):
     """Downloads ngrok.
@@ -43,15 +44,21 @@ def download_ngrok(force_download=False):
     )
 
 
-def download_chromedriver(force_download=False):
+def download_chromedriver(force_download=False, to_folder="bin"):
     """Downloads the necessary chromedriver.
 
     Downloads chromedriver version for the required chromedriver version
     for the matching operating system to the './bin' folder.
 
+    Working out the required version means running Chrome and asking Google,
+    so the answer is remembered in './bin/chromedriver.json' along with a
+    fingerprint of the installed Chrome (see `chrome_fingerprint`). As long
+    as Chrome hasn't changed, the existing chromedriver is used straight away.
+
     Args:
         force_download (bool, optional): Download and overwrite any existing chromedrivers.
             Defaults to False.
+        to_folder (str, optional): The folder to download to. Defaults to "bin".
 
     Returns:
         str: The path to the executable.
@@ -69,22 +76,55 @@ def download_chromedriver(force_download=False):
         Go there if this breaks because a new version of Chrome came out,
         and update the `required_chromedriver_version()` function.
     """
+    path_to_bin = f"{os.getcwd()}/{to_folder}/"
+    path_to_executable = path_to_bin + ("chromedriver.exe" if platform.system() == "Windows" else "chromedriver")
+    cache_filepath = path_to_bin + "chromedriver.json"
+
+    # skip the version lookup if Chrome hasn't changed since the last download
+    fingerprint = chrome_fingerprint()
+    cache = load_json_file(cache_filepath) if os.path.isfile(cache_filepath) else {}
+    if (
+        not force_download and fingerprint is not None
+        and cache.get("chrome") == fingerprint and os.path.isfile(path_to_executable)
+    ):
+        return path_to_executable
+
+    # replace the chromedriver we have if Chrome was updated since it was downloaded
+    version = required_chromedriver_version()
+    if cache.get("chromedriver_version") not in (None, version):
+        force_download = True
+
     # URLs for chromedriver Downloads
-    base_url = f"https://chromedriver.storage.googleapis.com/{required_chromedriver_version()}/"
+    base_url = f"https://chromedriver.storage.googleapis.com/{version}/"
     linux_suffix = "chromedriver_linux64.zip"
     mac_suffix = "chromedriver_mac64.zip"
     windows_suffix = "chromedriver_win32.zip"
 
-    # download the executable and return the path to the executable
-    return download_executable(
+    # download the executable
+    path_to_executable = download_executable(
         base_url,
         "chromedriver",
         linux_suffix,
         mac_suffix,
         windows_suffix,
-        force_download=force_download
+        force_download=force_download,
+        to_folder=to_folder
     )
 
+    # remember which Chrome this chromedriver is for
+    save_json_file({"chrome": fingerprint, "chromedriver_version": version}, cache_filepath)
+
+    # return the path to the executable
+    return path_to_executable
+
+
+def forget_chromedriver(to_folder="bin"):
+    """ forget which Chrome the downloaded chromedriver is for, so the next
+    `download_chromedriver` looks up the required version again """
+    cache_filepath = os.path.join(to_folder, "chromedriver.json")
+    if os.path.isfile(cache_filepath):
+        os.remove(cache_filepath)
+
 
 def download_executable(
     base_url, name,
@@ -0,0 +1,174 @@
+import os
+import time
+import tempfile
+import threading
+import subprocess
+
+from .profiling import span
+
+
+class FFmpegError(Exception):
+    """ raised when an ffmpeg job fails or runs past its deadline """
+
+
+class FFmpegScheduler:
+    """Runs ffmpeg jobs with a fixed thread budget, a deadline and timing stats.
+
+    At most `max_jobs` ffmpeg processes run at once and each one is told to
+    use `threads_per_job` threads, so together they fill the machine's cores
+    without oversubscribing them. Jobs that run past `timeout` are killed.
+    The wall and CPU time of every job is kept in `self.jobs`.
+
+    Args:
+        max_jobs (int, optional): How many ffmpeg processes to run at once.
+            Defaults to 1.
+        threads_per_job (int, optional): The `-threads` value for each job.
+            Defaults to all cores divided between `max_jobs` jobs.
+        timeout (int, optional): Seconds before a job is killed. Defaults to 600.
+
+    Examples:
+        >>> scheduler = FFmpegScheduler(max_jobs=2)
+        >>> scheduler.run(["-i", "in.mp4", "-loop", "0", "out.gif"])
+        {'output': 'out.gif', 'threads': 4, 'wall_time': 3.1, 'cpu_time': 11.8, 'returncode': 0}
+    """
+
+    def __init__(self, max_jobs=1, threads_per_job=None, timeout=600):
+        self.max_jobs = max(1, max_jobs)
+        self.threads_per_job = threads_per_job or threads_for(self.max_jobs)
+        self.timeout = timeout
+        self.jobs = []
+        self.slots = threading.Semaphore(self.max_jobs)
+        self.lock = threading.Lock()
+
+    def build_command(self, args):
+        """ wrap the given arguments (ending with the output file) in a full ffmpeg command """
+        threads = str(self.threads_per_job)
+        return (
+            ["ffmpeg", "-hide_banner", "-nostdin", "-y", "-threads", threads, "-filter_threads", threads]
+            + list(args[:-1])
+            + ["-threads", threads, args[-1]]
+        )
+
+    def run(self, args, timeout=None):
+        """Runs one ffmpeg job, waiting for a free slot first.
+
+        Args:
+            args (list of str): The ffmpeg arguments. The last one must be the output file.
+            timeout (int, optional): Overrides the scheduler's timeout for this job.
+
+        Returns:
+            dict: The job's "output", "threads", "wall_time", "cpu_time"
+                (None where the OS can't tell us) and "returncode".
+
+        Raises:
+            FFmpegError: If ffmpeg exits with an error or runs past its deadline.
+        """
+        timeout = timeout or self.timeout
+        command = self.build_command(args)
+
+        with self.slots, span("ffmpeg", output=os.path.basename(args[-1])):
+            start_time = time.monotonic()
+            with tempfile.TemporaryFile() as stderr:
+                process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+                try:
+                    cpu_time = wait_for_process(process, timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+                    raise FFmpegError(f"ffmpeg took longer than {timeout}s making '{args[-1]}'")
+                wall_time = time.monotonic() - start_time
+
+                # keep the end of ffmpeg's log for the error message
+                stderr.seek(0)
+                log = stderr.read().decode("utf-8", errors="replace")
+
+        job = {
+            "output": args[-1],
+            "threads": self.threads_per_job,
+            "wall_time": round(wall_time, 3),
+            "cpu_time": round(cpu_time, 3) if cpu_time is not None else None,
+            "returncode": process.returncode,
+        }
+        with self.lock:
+            self.jobs.append(job)
+
+        if process.returncode != 0:
+            raise FFmpegError(f"ffmpeg failed making '{args[-1]}':\n" + "\n".join(log.splitlines()[-10:]))
+
+        print(f"ffmpeg made '{os.path.basename(args[-1])}' in {job['wall_time']}s (cpu {job['cpu_time']}s)")
+        return job
+
+
+def threads_for(max_jobs):
+    """ split the machine's cores evenly between the given number of concurrent jobs """
+    return max(1, (os.cpu_count() or 1) // max(1, max_jobs))
+
+
+def wait_for_process(process, timeout):
+    """Waits for a process to exit and returns how much CPU time it used.
+
+    Args:
+        process (subprocess.Popen): The process to wait for.
+        timeout (float): Seconds to wait before giving up.
+
+    Returns:
+        float: The user + system CPU seconds of the process,
+            or None on systems without `os.wait4` (Windows).
+
+    Raises:
+        subprocess.TimeoutExpired: If the process is still running after `timeout`.
+    """
+    if not hasattr(os, "wait4"):
+        process.wait(timeout=timeout)
+        return None
+
+    deadline = time.monotonic() + timeout
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return rusage.ru_utime + rusage.ru_stime
+        if time.monotonic() > deadline:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+        time.sleep(0.05)
+
+
+# every process gets one scheduler, shared by all of its threads
+_scheduler = None
+
+
+def configure_ffmpeg(max_jobs=1, threads_per_job=None, timeout=600):
+    """ set up this process's ffmpeg scheduler (also used as a process pool initializer) """
+    global _scheduler
+    _scheduler = FFmpegScheduler(max_jobs=max_jobs, threads_per_job=threads_per_job, timeout=timeout)
+    return _scheduler
+
+
+def get_ffmpeg_scheduler():
+    """ this process's ffmpeg scheduler (using every core for one job at a time by default) """
+    if _scheduler is None:
+        configure_ffmpeg()
+    return _scheduler
+
+
+def run_ffmpeg(args, timeout=None):
+    """ run an ffmpeg job on this process's scheduler (see `FFmpegScheduler.run`) """
+    return get_ffmpeg_scheduler().run(args, timeout=timeout)
+
+
+def probe_video_codec(filepath, timeout=60):
+    """Gets the codec of the first video stream in a file using ffprobe.
+
+    Args:
+        filepath (str): The video to look at.
+        timeout (int, optional): Seconds before giving up. Defaults to 60.
+
+    Returns:
+        str: The codec name (e.g. "h264" or "vp9"), or "" if there is no video stream.
+    """
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name", "-of", "default=noprint_wrappers=1:nokey=1",
+        filepath
+    ], capture_output=True, text=True, timeout=timeout)
+    return result.stdout.strip()
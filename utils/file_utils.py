@@ -0,0 +1,31 @@
+import os
+import shutil
+
+
+def link_or_copy(src, dst):
+    """Puts a copy of `src` at `dst` using as little I/O as possible.
+
+    Hardlinks the file when the filesystem allows it (no data is copied
+    at all) and falls back to a regular copy otherwise, e.g. across drives.
+    Does nothing if `dst` is already the same file.
+
+    Args:
+        src (str): The file to copy.
+        dst (str): Where to put it. If this is a folder, the file keeps its name.
+
+    Returns:
+        str: The path of the linked or copied file.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return dst
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+    return dst
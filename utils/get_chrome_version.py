@@ -1,5 +1,7 @@
+import os
 import platform
 import re
+import shutil
 import requests
 from subprocess import check_output, Popen, PIPE
 
@@ -180,6 +182,123 @@ def chrome_version(full_version=False):
         raise Exception(f"Invalid operating system: {system_verison}!")
 
 
+# where distributions put the real browser behind their launcher scripts
+CHROME_BINARIES = [
+    "/opt/google/chrome/chrome",
+    "/usr/lib/chromium-browser/chromium-browser",
+    "/usr/lib/chromium/chromium",
+]
+
+
+def is_script(path):
+    """ whether the file is a shell script (or other #! launcher) rather than a real executable """
+    try:
+        with open(path, "rb") as f:
+            return f.read(2) == b"#!"
+    except OSError:
+        return False
+
+
+def launched_binary(script_path):
+    """Finds the executable a Chrome launcher script runs.
+
+    Ubuntu, Debian and Google's own packages all install a small shell
+    script as `chromium-browser`/`google-chrome`, which starts the real
+    browser from somewhere else. The script itself doesn't change when the
+    browser is updated.
+
+    Args:
+        script_path (str): The launcher script.
+
+    Returns:
+        str: The path of the real browser, or of the snap command if the
+            script runs a snap, or None if it couldn't be found.
+    """
+    with open(script_path, encoding="utf-8", errors="replace") as f:
+        text = f.read(64 * 1024)
+
+    # absolute paths in the script, then the usual install locations
+    candidates = re.findall(r"/[\w./+-]*chrom[\w+-]*", text)
+    candidates += [os.path.join(os.path.dirname(script_path), "chrome")] + CHROME_BINARIES
+    for candidate in candidates:
+        if candidate.startswith("/snap/bin/") or (os.path.isfile(candidate) and not is_script(candidate)):
+            return candidate
+    return None
+
+
+def snap_revision(snap_command):
+    """ the installed revision of the snap a /snap/bin command belongs to (e.g. '2497'), or None """
+    name = os.path.basename(snap_command).split(".")[0]
+    current = f"/snap/{name}/current"
+    if not os.path.exists(current):
+        return None
+    return f"{name}/{os.path.basename(os.path.realpath(current))}"
+
+
+def chrome_binary_path():
+    """ where the Chrome (or Chromium) executable is installed, or None if it can't be found
+
+    On Linux this looks through launcher scripts for the real browser. A
+    snap is returned as its /snap/bin command (see `snap_revision`). """
+    system_version = platform.system()
+    if system_version == "Linux":
+        for name in ["chromium-browser", "google-chrome"]:
+            path = shutil.which(name)
+            if not path:
+                continue
+
+            # snap commands are symlinks to /usr/bin/snap, which never changes
+            if path.startswith("/snap/bin/"):
+                return path
+
+            # follow the symlinks so we look at the real install
+            path = os.path.realpath(path)
+            if is_script(path):
+                return launched_binary(path) or path
+            return path
+    elif system_version == "Darwin":
+        path = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def chrome_fingerprint():
+    """Cheaply identifies the installed Chrome without running it or going online.
+
+    On Linux and Mac OS this is the path, modification time and size of
+    the Chrome executable (not the launcher script in front of it), which
+    all change when Chrome is updated. For a snap it is the snap's
+    revision. On Windows it is the version Chrome writes to the registry.
+
+    Returns:
+        dict: The fingerprint, or None if Chrome couldn't be found.
+
+    Examples:
+        >>> chrome_fingerprint()
+        {'path': '/opt/google/chrome/chrome', 'mtime_ns': 1573430400000000000, 'size': 198201136}
+        >>> chrome_fingerprint()  # Ubuntu's chromium-browser
+        {'snap': 'chromium/2497'}
+    """
+    if platform.system() == "Windows":
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon") as key:
+                version, _ = winreg.QueryValueEx(key, "version")
+            return {"version": version}
+        except OSError:
+            return None
+
+    path = chrome_binary_path()
+    if path is None:
+        return None
+    if path.startswith("/snap/bin/"):
+        revision = snap_revision(path)
+        return {"snap": revision} if revision else None
+    stat = os.stat(path)
+    return {"path": path, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
 def get_matching_chromedriver_version(version):
     """Retrieves the matching chromedriver version from Google.
 
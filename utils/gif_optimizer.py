@@ -0,0 +1,108 @@
+import os
+from PIL import Image, ImageSequence
+
+
+def optimization_comment(max_height, colors):
+    """ the GIF comment that marks a file as already optimized with these settings """
+    return f"optimized max_height={max_height} colors={colors}".encode("utf-8")
+
+
+class TransparentGifError(Exception):
+    """ raised while optimizing a GIF that has transparent pixels """
+
+
+def optimized_frames(im, new_size, colors):
+    """ decode, downscale and quantize one frame at a time, so only the encoder holds on to frames """
+    for frame in ImageSequence.Iterator(im):
+        duration = frame.info.get("duration", 100)
+        frame = frame.convert("RGBA")
+
+        # don't risk turning transparent pixels into a solid color
+        if frame.getextrema()[3][0] < 255:
+            raise TransparentGifError()
+
+        frame = frame.convert("RGB")
+        if frame.size != new_size:
+            frame = frame.resize(new_size, Image.LANCZOS)
+        if colors:
+            frame = frame.quantize(colors=colors, method=Image.MEDIANCUT, dither=Image.FLOYDSTEINBERG)
+        frame.info["duration"] = duration
+        yield frame
+
+
+def optimize_gif(filepath, max_height=1080, colors=None):
+    """Shrinks a GIF in place by downscaling it and only storing what changes.
+
+    - frames taller than `max_height` are downscaled to it
+    - each frame is stored as just the rectangle that changed since the previous
+      frame (Pillow's GIF encoder does this when frames aren't disposed)
+    - if `colors` is given, each frame is quantized down to that many colors,
+      which is lossy but can shrink a GIF a lot
+
+    A GIF taller than `max_height` is always replaced by the downscaled one.
+    Otherwise the GIF is only replaced if the result is smaller, and a GIF
+    that fits and keeps its colors isn't touched at all. It is tagged with a
+    comment so running this again with the same settings does nothing.
+    GIFs with transparency are left alone.
+
+    Frames are streamed into the encoder, which only keeps each one as
+    palette indices, so long GIFs don't need a full RGB copy of every frame
+    in memory.
+
+    Args:
+        filepath (str): The GIF to optimize.
+        max_height (int, optional): The tallest the GIF may be, or None to keep
+            its size. Defaults to 1080.
+        colors (int, optional): The number of colors to quantize to, or None
+            to keep the colors as they are. Defaults to None.
+
+    Returns:
+        tuple of int: The size of the file in bytes before and after.
+
+    Examples:
+        >>> optimize_gif("downloads/dog/dog.gif", max_height=720, colors=128)
+        (3145728, 1048576)
+    """
+    size_before = os.path.getsize(filepath)
+    comment = optimization_comment(max_height, colors)
+    tmp_filepath = filepath + ".tmp.gif"
+
+    with Image.open(filepath) as im:
+        # already done with these settings
+        if im.info.get("comment") == comment:
+            return size_before, size_before
+
+        too_tall = bool(max_height) and im.height > max_height
+        if not too_tall and colors is None:
+            return size_before, size_before
+
+        scale = max_height / im.height if too_tall else 1
+        new_size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+
+        frames = optimized_frames(im, new_size, colors)
+        # write to a temporary file first (this also breaks any hardlink to the conversion cache)
+        try:
+            first_frame = next(frames)
+            first_frame.save(
+                tmp_filepath,
+                save_all=True,
+                append_images=frames,
+                loop=im.info.get("loop", 0),
+                disposal=1,
+                optimize=True,
+                comment=comment,
+            )
+        except TransparentGifError:
+            print(f"Not optimizing '{filepath}' because it has transparency.")
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            return size_before, size_before
+
+    size_after = os.path.getsize(tmp_filepath)
+    if too_tall or size_after < size_before:
+        os.replace(tmp_filepath, filepath)
+        return size_before, size_after
+
+    # not worth it, keep the original
+    os.remove(tmp_filepath)
+    return size_before, size_before
@@ -0,0 +1,195 @@
+import re
+import requests
+from html.parser import HTMLParser
+
+
+# tags that never have a closing tag
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+
+
+class HTMLNode:
+    """ a bare-bones DOM node, just enough to mirror the JS extractor """
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs or [])
+        self.parent = parent
+        self.children = []
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+    def classes(self):
+        return (self.attrs.get("class") or "").split()
+
+    def iter(self):
+        """ depth-first iteration over all descendants (document order) """
+        for child in self.children:
+            if isinstance(child, HTMLNode):
+                yield child
+                yield from child.iter()
+
+    def find(self, predicate):
+        """ the first descendant matching the predicate, like `querySelector` """
+        return next((node for node in self.iter() if predicate(node)), None)
+
+    def find_all(self, predicate):
+        """ all descendants matching the predicate, like `querySelectorAll` """
+        return [node for node in self.iter() if predicate(node)]
+
+    def inner_text(self):
+        """ the text inside this node with whitespace collapsed, like `innerText` """
+        parts = []
+        for child in self.children:
+            parts.append(child.inner_text() if isinstance(child, HTMLNode) else child)
+        return " ".join("".join(parts).split())
+
+
+class _TreeBuilder(HTMLParser):
+    """ builds a tree of HTMLNodes, tolerating unclosed tags """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = HTMLNode("#document")
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = HTMLNode(tag, attrs, parent=self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(HTMLNode(tag, attrs, parent=self.current))
+
+    def handle_endtag(self, tag):
+        # close the nearest open tag with this name (and anything left open inside it)
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_html(html):
+    """Parses an HTML document into a tree of `HTMLNode`s.
+
+    Args:
+        html (str): The HTML to parse.
+
+    Returns:
+        HTMLNode: The root of the document.
+    """
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def has_class(name):
+    return lambda node: name in node.classes()
+
+
+def extract_sources(html):
+    """Extracts every liked shot from a likes page.
+
+    This is a Python port of the JS extractor used by the browser backend
+    and produces exactly the same dicts.
+
+    Args:
+        html (str): The HTML of a likes page (or a "load more" fragment).
+
+    Returns:
+        list of dict: One dict per shot with the keys
+            "src", "name", "author_url" and "author".
+    """
+    sources = []
+    for e in parse_html(html).find_all(has_class("shot-thumbnail")):
+        name_node = e.find(has_class("shot-title"))
+        name = name_node.inner_text() if name_node else None
+        author_url_node = e.find(lambda n: n.tag == "a" and n.get_attribute("rel") == "contact")
+        author_url = author_url_node.get_attribute("href") if author_url_node else None
+        author_node = e.find(has_class("display-name"))
+        author = author_node.inner_text() if author_node else None
+
+        # is it a GIF or an MP4?
+        image_node = e.find(lambda n: n.tag == "img")
+        if image_node is None:
+            continue
+        image_source = image_node.get_attribute("src") or ""
+        if ".png" in image_source: # mp4
+            base_node = e.find(lambda n: "shot-thumbnail-base" in (n.get_attribute("class") or ""))
+            teaser = base_node and base_node.get_attribute("data-video-teaser-large")
+            if not teaser:
+                continue
+            media_source = teaser.replace("_large_preview", "")
+        else: # gif
+            media_source = re.sub(r"(_still|_\dx).*", ".gif", image_source, count=1)
+
+        # add to sources
+        sources.append({
+            "src": media_source,
+            "name": name,
+            # JS turns a missing href into "null" when concatenating
+            "author_url": "https://dribbble.com" + (author_url if author_url is not None else "null"),
+            "author": author,
+        })
+    return sources
+
+
+def scrape_likes(username, base_url="https://dribbble.com", session=None, max_pages=None, timeout=60):
+    """Scrapes all of a user's likes over plain HTTP, without starting a browser.
+
+    Fetches `{base_url}/{username}/likes?page=N` until a page has no new shots
+    or shows the "null-message" that marks the end of the list.
+
+    Args:
+        username (str): The Dribbble user whose likes to fetch.
+        base_url (str, optional): Where to fetch the pages from. Point this at a
+            local server to scrape recorded pages. Defaults to "https://dribbble.com".
+        session (requests.Session, optional): The session to reuse connections from.
+            Defaults to a new session.
+        max_pages (int, optional): Stop after this many pages. Defaults to no limit.
+        timeout (int, optional): Seconds to wait for each page. Defaults to 60.
+
+    Returns:
+        list of dict: The same dicts as `extract_sources`, in page order.
+
+    Examples:
+        >>> scrape_likes("krisVIBES", base_url="http://127.0.0.1:8000")
+        [{'src': 'https://cdn.dribbble.com/.../dog.gif', 'name': 'Dog', ...}, ...]
+    """
+    if session is None:
+        session = requests.Session()
+
+    sources = []
+    seen = set()
+    page = 1
+    while max_pages is None or page <= max_pages:
+        print(f"Fetching likes page {page}.")
+        headers = {"X-Requested-With": "XMLHttpRequest"} if page > 1 else {}
+        r = session.get(
+            f"{base_url}/{username}/likes",
+            params={"page": page},
+            headers=headers,
+            timeout=timeout
+        )
+        r.raise_for_status()
+
+        # keep only shots we haven't seen on an earlier page
+        page_sources = extract_sources(r.text)
+        new_sources = [s for s in page_sources if s["src"] not in seen]
+        seen.update(s["src"] for s in page_sources)
+        sources.extend(new_sources)
+
+        if not new_sources or "null-message" in r.text:
+            break
+        page += 1
+
+    return sources
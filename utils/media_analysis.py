@@ -0,0 +1,210 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# these get decoded with OpenCV instead of Pillow
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mov")
+
+
+class MediaAnalysis:
+    """Opens an animated image (or video) once and shares its decoded first frame.
+
+    Preview generation, background color detection and any other metadata
+    lookups for the same wallpaper should all go through one instance,
+    so the file is only opened and its first frame only decoded once.
+
+    Args:
+        filepath (str): The GIF, other animated image or video to analyze.
+
+    Examples:
+        >>> with MediaAnalysis("downloads/dog/dog.gif") as analysis:
+        ...     analysis.first_frame.save("downloads/dog/preview.png")
+        ...     analysis.first_frame.getpixel((0, 0))
+        (255, 214, 102, 255)
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._image = None
+        self._video = None
+        self._first_frame = None
+        self.is_video = filepath.lower().endswith(VIDEO_EXTENSIONS)
+
+    @property
+    def image(self):
+        """ the opened image (positioned on whatever frame was read last) """
+        if self._image is None:
+            self._image = Image.open(self.filepath)
+        return self._image
+
+    @property
+    def video(self):
+        """ the opened video capture (only for videos) """
+        if self._video is None:
+            self._video = cv2.VideoCapture(self.filepath)
+            if not self._video.isOpened():
+                raise IOError(f"Could not open video '{self.filepath}'")
+        return self._video
+
+    def read_video_frame(self, index):
+        """ decode the given frame of the video as an RGB array """
+        self.video.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ok, frame = self.video.read()
+        if not ok:
+            raise IOError(f"Could not read frame {index} of '{self.filepath}'")
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    @property
+    def first_frame(self):
+        """ the first frame as an RGBA image, decoded only once """
+        if self._first_frame is None and self.is_video:
+            self._first_frame = Image.fromarray(self.read_video_frame(0)).convert("RGBA")
+        elif self._first_frame is None:
+            im = self.image
+            im.seek(0)
+
+            # transfer palette from GIF to image
+            palette = im.getpalette()
+            if palette is not None:
+                im.putpalette(palette)
+
+            self._first_frame = Image.new("RGBA", im.size)
+            self._first_frame.paste(im)
+        return self._first_frame
+
+    @property
+    def size(self):
+        if self.is_video:
+            return (
+                int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            )
+        return self.image.size
+
+    @property
+    def n_frames(self):
+        if self.is_video:
+            return max(1, int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)))
+        return getattr(self.image, "n_frames", 1)
+
+    def sample_frame_indices(self, num_frames, within=None):
+        """ evenly spaced frame indices across the animation (or just its first `within` frames) """
+        total = self.n_frames if within is None else min(self.n_frames, within)
+        if total <= num_frames:
+            return list(range(total))
+        return sorted(set(np.linspace(0, total - 1, num_frames).astype(int).tolist()))
+
+    def sample_frames(self, num_frames=5, within=24):
+        """Decodes a few evenly spaced frames as RGB arrays.
+
+        Args:
+            num_frames (int, optional): How many frames to sample. Defaults to 5.
+            within (int, optional): Only sample from this many leading frames
+                (see `border_pixels`). Defaults to 24.
+
+        Yields:
+            numpy.ndarray: An (height, width, 3) uint8 array per frame.
+        """
+        for index in self.sample_frame_indices(num_frames, within=within):
+            if self.is_video:
+                yield self.read_video_frame(index)
+            else:
+                self.image.seek(index)
+                yield np.asarray(self.image.convert("RGB"))
+
+    def border_pixels(self, num_frames=3, within=3):
+        """Gets the RGB values of every pixel on the edge of a sample of frames.
+
+        Only four one-pixel strips are cropped out of each frame and converted
+        to RGB, whatever mode Pillow decoded the frame in, so the rest of a
+        large frame is never converted.
+
+        Args:
+            num_frames (int, optional): How many frames to sample. Defaults to 3.
+            within (int, optional): Only sample from this many leading frames.
+                GIF frames can only be decoded in order, so every frame up to
+                the last sampled one gets decoded. Defaults to 3.
+
+        Returns:
+            numpy.ndarray: An (N, 3) uint8 array of RGB values.
+        """
+        borders = []
+        for index in self.sample_frame_indices(num_frames, within=within):
+            if self.is_video:
+                borders.append(edge_pixels(self.read_video_frame(index)).reshape(-1, 3))
+                continue
+
+            im = self.image
+            im.seek(index)
+            width, height = im.size
+            edges = [
+                (0, 0, width, 1), (0, height - 1, width, height),
+                (0, 1, 1, height - 1), (width - 1, 1, width, height - 1),
+            ]
+            for box in edges:
+                strip = im.crop(box)
+                if strip.width and strip.height:
+                    borders.append(np.asarray(strip.convert("RGB")).reshape(-1, 3))
+        return np.concatenate(borders)
+
+    def close(self):
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def edge_pixels(array):
+    """ the top, bottom, left and right edges of a 2D (or 2D x channels) array """
+    return np.concatenate([array[0], array[-1], array[1:-1, 0], array[1:-1, -1]])
+
+
+def dominant_border_color(media, num_frames=3, tolerance=12):
+    """Finds the most common color along the edges of an animation.
+
+    Colors within `tolerance` of each other (per channel) are counted
+    together, so dithering and compression noise don't split the vote.
+    The winner is the average of the actual pixels in the biggest group.
+
+    Args:
+        media (str or MediaAnalysis): The animation to look at.
+        num_frames (int, optional): How many leading frames to sample. Defaults to 3.
+        tolerance (int, optional): How far apart two colors can be per channel
+            and still count as the same color. Defaults to 12.
+
+    Returns:
+        tuple of int: The (r, g, b) background color.
+
+    Examples:
+        >>> dominant_border_color("downloads/dog/dog.gif")
+        (255, 214, 102)
+    """
+    pixels = as_analysis(media).border_pixels(num_frames=num_frames, within=num_frames).astype(np.int32)
+
+    # bucket similar colors together and pack each bucket into one integer
+    buckets = pixels // max(1, tolerance)
+    keys = (buckets[:, 0] << 16) | (buckets[:, 1] << 8) | buckets[:, 2]
+
+    # find the biggest bucket
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    winner = np.argmax(counts)
+
+    # average the real colors that fell into it
+    r, g, b = np.rint(pixels[inverse.reshape(-1) == winner].mean(axis=0)).astype(int)
+    return int(r), int(g), int(b)
+
+
+def as_analysis(media):
+    """ accept either a filepath or an existing MediaAnalysis """
+    if isinstance(media, MediaAnalysis):
+        return media
+    return MediaAnalysis(media)
@@ -0,0 +1,265 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .asset_manifest import hash_file
+from .json_utils import load_json_file, save_json_file
+
+
+# each thread keeps its own pooled session so connections get reused
+_thread_local = threading.local()
+
+
+def get_session():
+    """Gets the pooled HTTP session for the current thread.
+
+    Returns:
+        requests.Session: A session that keeps connections alive between requests.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        _thread_local.session = session
+    return session
+
+
+def download_file(url, filepath, etag=None, last_modified=None, chunk_size=1024 * 1024, timeout=60):
+    """Downloads the given URL to the given filepath, resuming if possible.
+
+    The file is streamed in chunks to `<filepath>.part` and only renamed to
+    `filepath` once it is complete, so an interrupted download never leaves
+    a truncated file behind. If a `.part` file already exists, an HTTP
+    `Range` request picks up where it left off.
+
+    The ETag or Last-Modified of the response that started the `.part`
+    file is kept next to it in `<filepath>.part.json` and sent as
+    `If-Range`, so the server only sends the rest if the file hasn't
+    changed since. The download restarts from byte zero if the server
+    sends the whole file instead, if the range it sends doesn't start where
+    the `.part` file ends, or if there is no validator to resume safely with.
+
+    If `etag` or `last_modified` are given, the request is conditional and
+    nothing is downloaded when the server answers "304 Not Modified".
+
+    Args:
+        url (str): The URL to download.
+        filepath (str): Where to save the downloaded file.
+        etag (str, optional): The ETag of the copy we already have.
+        last_modified (str, optional): The Last-Modified of the copy we already have.
+        chunk_size (int, optional): The number of bytes to read at a time.
+            Defaults to 1 MB.
+        timeout (int, optional): Seconds to wait for the server before giving up.
+            Defaults to 60.
+
+    Returns:
+        dict: What happened, with the keys
+            "not_modified" (bool), "bytes_written" (int), "size" (int),
+            "sha256" (str), "etag" (str) and "last_modified" (str).
+            Only "not_modified" and "bytes_written" are set on a 304.
+
+    Raises:
+        requests.HTTPError: If the server responds with an error status.
+        IOError: If the connection closed before the whole file arrived.
+            The `.part` file is kept so the next attempt can resume.
+    """
+    part_filepath = filepath + ".part"
+    validators_filepath = part_filepath + ".json"
+
+    # figure out how much we already have, and which version of the file it came from
+    resume_from = os.path.getsize(part_filepath) if os.path.isfile(part_filepath) else 0
+    if_range = _if_range(validators_filepath) if resume_from else None
+    if resume_from and if_range is None:
+        # without a validator we can't tell whether the file changed since, so start over
+        _discard_partial(part_filepath)
+        resume_from = 0
+
+    # ask for the raw bytes so Content-Length matches what we write to disk
+    headers = {"Accept-Encoding": "identity"}
+    if resume_from:
+        headers["Range"] = f"bytes={resume_from}-"
+        headers["If-Range"] = if_range
+    else:
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as r:
+        # our copy is still up to date
+        if r.status_code == 304:
+            return {"not_modified": True, "bytes_written": 0}
+
+        # the server says we already have the whole thing
+        if r.status_code == 416:
+            match = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+            if match and int(match.group(1)) == resume_from:
+                return _finish_download(part_filepath, filepath, r, hash_file(part_filepath), 0)
+
+            # our partial file doesn't match what's on the server, start over
+            _discard_partial(part_filepath)
+            return download_file(url, filepath, chunk_size=chunk_size, timeout=timeout)
+
+        r.raise_for_status()
+
+        # "206 Partial Content" means the server honored our range, but only
+        # use it if it really starts where our partial file ends
+        if r.status_code == 206 and _range_start(r) != resume_from:
+            r.close()
+            _discard_partial(part_filepath)
+            return download_file(url, filepath, chunk_size=chunk_size, timeout=timeout)
+
+        sha256 = hashlib.sha256()
+        if r.status_code == 206:
+            mode = "ab"
+
+            # the hash has to cover the bytes we already have too
+            with open(part_filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    sha256.update(chunk)
+        else:
+            mode = "wb"
+            resume_from = 0
+
+            # remember which version of the file this is, in case we have to resume it
+            save_json_file({
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }, validators_filepath)
+
+        # how big the finished file should be (if the server tells us)
+        expected_size = r.headers.get("Content-Length")
+        if expected_size is not None:
+            expected_size = resume_from + int(expected_size)
+
+        # stream to the .part file
+        num_bytes = 0
+        with open(part_filepath, mode) as f:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                sha256.update(chunk)
+                num_bytes += len(chunk)
+
+    # don't promote a truncated download
+    if expected_size is not None and os.path.getsize(part_filepath) != expected_size:
+        raise IOError(f"Download of '{url}' was cut short, will resume next time.")
+
+    return _finish_download(part_filepath, filepath, r, sha256.hexdigest(), num_bytes)
+
+
+def _if_range(validators_filepath):
+    """ the If-Range value for resuming a .part file, or None if it can't be resumed safely """
+    try:
+        validators = load_json_file(validators_filepath)
+    except (OSError, ValueError):
+        return None
+
+    # a weak ETag can't be used for ranges, the date is the next best thing
+    etag = validators.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("last_modified")
+
+
+def _range_start(response):
+    """ the first byte of a 206 response's Content-Range, or None if it has none """
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _discard_partial(part_filepath):
+    """ delete a .part file and the validators it was downloaded with """
+    for path in (part_filepath, part_filepath + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _finish_download(part_filepath, filepath, response, sha256, num_bytes):
+    """ atomically move a finished .part file into place and describe it """
+    os.replace(part_filepath, filepath)
+    if os.path.exists(part_filepath + ".json"):
+        os.remove(part_filepath + ".json")
+    return {
+        "not_modified": False,
+        "bytes_written": num_bytes,
+        "size": os.path.getsize(filepath),
+        "sha256": sha256,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def fetch_validators(url, timeout=60):
+    """Gets the cache validators for a URL without downloading it.
+
+    Args:
+        url (str): The URL to check.
+        timeout (int, optional): Seconds to wait for the server before giving up.
+            Defaults to 60.
+
+    Returns:
+        dict: The "etag", "last_modified" and "size" the server reports
+            (any of which may be None).
+    """
+    r = get_session().head(url, allow_redirects=True, timeout=timeout)
+    r.raise_for_status()
+    size = r.headers.get("Content-Length")
+    return {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "size": int(size) if size is not None else None,
+    }
+
+
+def download_concurrently(jobs, download_func, workers=8):
+    """Runs a download function over many jobs with a bounded number of threads.
+
+    Downloads are network-bound, so a pool of threads keeps several
+    requests in flight at once instead of idling on latency.
+    At most `workers` downloads run at the same time.
+
+    Args:
+        jobs (list): The items to pass to `download_func`, one call per item.
+        download_func (func): Called as `download_func(job, index, total)`
+            and must return the number of bytes it downloaded.
+        workers (int, optional): The maximum number of concurrent downloads.
+            Defaults to 8.
+
+    Returns:
+        int: The total number of bytes downloaded.
+
+    Examples:
+        >>> download_concurrently(sources, download_source, workers=16)
+        Downloaded 42 file(s), 183.2 MB in 21.4s (8.56 MB/s).
+        192113482
+    """
+    total = len(jobs)
+    total_bytes = 0
+    num_downloaded = 0
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(download_func, job, i, total)
+            for i, job in enumerate(jobs, start=1)
+        ]
+
+        # tally up results as they finish
+        for future in as_completed(futures):
+            num_bytes = future.result()
+            if num_bytes:
+                total_bytes += num_bytes
+                num_downloaded += 1
+
+    # report aggregate throughput
+    elapsed = max(time.time() - start_time, 1e-6)
+    megabytes = total_bytes / (1024 * 1024)
+    print((
+        f"Downloaded {num_downloaded} file(s), {megabytes:.1f} MB "
+        f"in {elapsed:.1f}s ({megabytes / elapsed:.2f} MB/s)."
+    ))
+
+    return total_bytes
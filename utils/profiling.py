@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Collects timing spans from every thread and exports them as a Chrome trace.
+
+    Spans nest naturally: a span opened inside another one on the same
+    thread shows up underneath it in chrome://tracing or https://ui.perfetto.dev.
+    Spans recorded in worker processes can be sent back and merged in
+    with `add_spans`.
+
+    Examples:
+        >>> profiler = enable_profiling()
+        >>> with span("make_background", filepath="downloads/dog/dog.gif"):
+        ...     with span("preview"):
+        ...         save_first_frame_of_gif(...)
+        >>> profiler.save_trace("profile.json")
+        >>> profiler.print_summary()
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def record(self, name, start_us, duration_us, args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": duration_us,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.lock:
+            self.spans.append(event)
+
+    def add_spans(self, spans):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def take_spans(self):
+        """ remove and return everything recorded so far """
+        with self.lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def summary(self):
+        """Totals and percentiles of the span durations, per span name.
+
+        Returns:
+            list of dict: One row per name with its "name", "count", "total",
+                "p50" and "p95" in seconds, slowest total first.
+        """
+        with self.lock:
+            spans = list(self.spans)
+
+        durations = {}
+        for event in spans:
+            durations.setdefault(event["name"], []).append(event["dur"] / 1e6)
+
+        rows = []
+        for name, values in durations.items():
+            rows.append({
+                "name": name,
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            })
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def print_summary(self):
+        rows = self.summary()
+        width = max([len("stage")] + [len(row["name"]) for row in rows])
+        print(f"{'stage':<{width}}  {'count':>6}  {'total (s)':>10}  {'p50 (s)':>9}  {'p95 (s)':>9}")
+        for row in rows:
+            print(
+                f"{row['name']:<{width}}  {row['count']:>6}  {row['total']:>10.3f}"
+                f"  {row['p50']:>9.3f}  {row['p95']:>9.3f}"
+            )
+
+    def save_trace(self, filepath):
+        """ write the spans as Chrome trace-event JSON """
+        with self.lock:
+            events = sorted(self.spans, key=lambda event: event["ts"])
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def percentile(values, percent):
+    """ the nearest-rank percentile of a list of numbers """
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+# every process has at most one profiler, and none unless profiling was turned on
+_profiler = None
+
+
+def enable_profiling():
+    """ start recording spans in this process (also used in worker processes) """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def get_profiler():
+    """ this process's profiler, or None if profiling is off """
+    return _profiler
+
+
+@contextmanager
+def span(name, **args):
+    """Times the code inside it as one span (does nothing unless profiling is on).
+
+    Can also be used as a decorator to time every call of a function.
+
+    Args:
+        name (str): The stage being timed. Spans with the same name are
+            grouped together in the summary.
+        **args: Extra details to show in the trace (e.g. the filepath).
+    """
+    if _profiler is None:
+        yield
+        return
+
+    # wall clock timestamps line up across processes, the performance counter is more precise
+    start_us = time.time_ns() // 1000
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _profiler.record(name, start_us, int((time.perf_counter() - start) * 1e6), args)
+
+
+def take_worker_spans():
+    """ the spans recorded in this worker process, so they can be sent back to the parent
+    (an empty list in the main process, where the spans are already in the right place) """
+    if _profiler is None or multiprocessing.parent_process() is None:
+        return []
+    return _profiler.take_spans()
@@ -0,0 +1,75 @@
+import re
+import html
+import json
+from functools import lru_cache
+
+
+# placeholders look like $TITLE or $FILENAME
+PLACEHOLDER = re.compile(r"\$([A-Z][A-Z0-9_]*)")
+
+
+def escape_html(value):
+    """ escape a value for use in HTML text or a quoted attribute """
+    return html.escape(str(value), quote=True)
+
+
+def escape_json(value):
+    """ escape a value for use inside a JSON string literal """
+    return json.dumps(str(value), ensure_ascii=False)[1:-1]
+
+
+ESCAPES = {
+    "html": escape_html,
+    "json": escape_json,
+}
+
+
+class Template:
+    """A template with `$NAME` placeholders, parsed once and rendered many times.
+
+    The text is split into literal chunks and placeholder names up front,
+    so rendering is a single join instead of a `str.replace` per placeholder.
+    Every value is escaped for the kind of file being rendered.
+
+    Args:
+        text (str): The template text.
+        escape (str): How to escape values, either "html" or "json".
+
+    Examples:
+        >>> Template('<title>$TITLE</title>', "html").render(TITLE="Cats & Dogs")
+        '<title>Cats &amp; Dogs</title>'
+        >>> Template('{"title": "$TITLE"}', "json").render(TITLE='Say "hi"')
+        '{"title": "Say \\\\"hi\\\\""}'
+    """
+
+    def __init__(self, text, escape):
+        self.escape = ESCAPES[escape]
+
+        # even indices are literal text, odd indices are placeholder names
+        self.parts = PLACEHOLDER.split(text)
+        self.names = set(self.parts[1::2])
+
+    def render(self, **values):
+        missing = self.names - set(values)
+        if missing:
+            raise KeyError(f"Missing template value(s): {', '.join(sorted(missing))}")
+
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = self.escape(values[parts[i]])
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_template(filepath, escape):
+    """Loads and compiles a template file, only reading it once per process.
+
+    Args:
+        filepath (str): The template file.
+        escape (str): How to escape values, either "html" or "json".
+
+    Returns:
+        Template: The compiled template.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        return Template(f.read(), escape)
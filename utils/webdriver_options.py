@@ -7,10 +7,16 @@ def get_chrome_options(
     dev_shm_usage=False, notifications=False,
     spoof_user_agent=True, user_agent=None,
     user_profile_dir=None, start_maximized=True,
-    ignore_errors=False,
+    ignore_errors=False, lean=False, debugger_address=None,
 ):
     # define chromium options
     chrome_options = webdriver.ChromeOptions()
+
+    # attach to an already running Chrome (which was started with its own flags)
+    if debugger_address:
+        chrome_options.add_experimental_option("debuggerAddress", debugger_address)
+        return chrome_options
+
     if headless:
         chrome_options.add_argument('--headless')
     if not sandbox:
@@ -50,4 +56,14 @@ def get_chrome_options(
         chrome_options.add_argument("--ignore-certificate-errors")
         chrome_options.add_argument("--ignore-ssl-errors")
 
+    # don't download or decode images and media we never look at
+    if lean:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+
     return chrome_options
@@ -0,0 +1,94 @@
+let top1 = 0;
+let left1 = 0;
+
+let bottom1 = 100;
+let left2 = 0;
+
+let bottom2 = 100;
+let right1 = 100;
+
+let top2 = 0;
+let right2 = 100;
+
+// latest values from the property sliders, applied together on the next animation frame
+let size = null;
+let updateScheduled = false;
+
+// we stop decoding video frames if Wallpaper Engine paused us or the page is hidden
+let pausedByEngine = false;
+let hidden = false;
+
+const crop = () => {
+    scheduleUpdate();
+}
+
+const scheduleUpdate = () => {
+    if (updateScheduled) {
+        return;
+    }
+    updateScheduled = true;
+    requestAnimationFrame(() => {
+        updateScheduled = false;
+        const element = document.getElementById("main-img");
+        if (size !== null) {
+            element.style.height = size + "px";
+        }
+        element.style["clip-path"] = `polygon(${left1}% ${top1}%, ${left2}% ${bottom1}%, ${right1}% ${bottom2}%, ${right2}% ${top2}%)`;
+    });
+}
+
+const updatePaused = () => {
+    const video = document.getElementById("main-img");
+    if (pausedByEngine || hidden) {
+        video.pause();
+    } else {
+        video.play();
+    }
+}
+
+document.addEventListener("visibilitychange", () => {
+    hidden = document.hidden;
+    updatePaused();
+});
+
+window.wallpaperPropertyListener = {
+    setPaused: (isPaused) => {
+        pausedByEngine = isPaused;
+        updatePaused();
+    },
+
+    applyUserProperties: (properties) => {
+        if (properties.size) {
+            size = properties.size.value;
+            scheduleUpdate();
+        }
+
+        if (properties["crop-left"]) {
+            let val = properties["crop-left"].value;
+            left1 = val;
+            left2 = val;
+            crop();
+        }
+
+        if (properties["crop-right"]) {
+            let val = properties["crop-right"].value;
+            right1 = 100 - val;
+            right2 = 100 - val;
+            crop();
+        }
+
+        if (properties["crop-top"]) {
+            let val = properties["crop-top"].value;
+            top1 = val;
+            top2 = val;
+            crop();
+        }
+
+        if (properties["crop-bottom"]) {
+            let val = properties["crop-bottom"].value;
+            bottom1 = 100 - val;
+            bottom2 = 100 - val;
+            crop();
+        }
+    }
+};